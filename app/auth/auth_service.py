@@ -1,36 +1,43 @@
+import logging
 from datetime import datetime, timezone
 from fastapi import HTTPException, status
 import httpx
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
+from app.auth.http_client import get_keycloak_client
+from app.auth.principal import invalidate_principal
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
-from app.utils.hashing import hash_password, verify_password
+from app.utils.hashing import hash_password_async, verify_password_async
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 # Register user
-def register_user(user_data: UserCreate, db: Session):
-    username_exists = db.query(User).filter(User.username == user_data.username).first()
+async def register_user(user_data: UserCreate, db: AsyncSession):
+    username_exists = await db.scalar(select(User.id).where(User.username == user_data.username))
     if username_exists:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
             )
     
-    email_exists = db.query(User).filter(User.email == user_data.email).first()
+    email_exists = await db.scalar(select(User.id).where(User.email == user_data.email))
     if email_exists:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    phone_exists = db.query(User).filter(User.phone == user_data.phone).first()
+    phone_exists = await db.scalar(select(User.id).where(User.phone == user_data.phone))
     if phone_exists:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Phone number already registered"
         )
 
-    hashed = hash_password(user_data.password)
+    hashed = await hash_password_async(user_data.password)
     new_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -43,50 +50,50 @@ def register_user(user_data: UserCreate, db: Session):
         updated_at=datetime.now(timezone.utc)
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user, ["role"])
     return new_user
 
 
 # Login user
-async def login_user(username: str, password: str, db: Session):
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def login_user(username: str, password: str, db: AsyncSession):
+    user = await db.scalar(select(User).where(User.username == username))
+    if not user or not await verify_password_async(password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{settings.KEYCLOAK_URL}/realms/{settings.KEYCLOAK_REALM}/protocol/openid-connect/token",
-                data={
-                    "grant_type": "password",
-                    "client_id": settings.KEYCLOAK_CLIENT_ID,
-                    "client_secret": settings.KEYCLOAK_CLIENT_SECRET,
-                    "username": username,
-                    "password": password,
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-            )
-            response.raise_for_status()
-            tokens = response.json()
-            return {
-                "access_token": tokens["access_token"],
-                "refresh_token": tokens.get("refresh_token", ""),
-                "token_type": tokens["token_type"],
-            }
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Keycloak authentication failed: {e.response.text}",
-            )
+    client = get_keycloak_client()
+    try:
+        response = await client.post(
+            "/token",
+            data={
+                "grant_type": "password",
+                "client_id": settings.KEYCLOAK_CLIENT_ID,
+                "client_secret": settings.KEYCLOAK_CLIENT_SECRET,
+                "username": username,
+                "password": password,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        response.raise_for_status()
+        tokens = response.json()
+        return {
+            "access_token": tokens["access_token"],
+            "refresh_token": tokens.get("refresh_token", ""),
+            "token_type": tokens["token_type"],
+        }
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Keycloak authentication failed: {e.response.text}",
+        )
 
 
 # Update user details
-def update_user(user_update: UserUpdate, db: Session, current_user: User):
-    db_user = db.query(User).filter(User.id == current_user.id).first()
+async def update_user(user_update: UserUpdate, db: AsyncSession, current_user: User):
+    db_user = await db.scalar(select(User).options(joinedload(User.role)).where(User.id == current_user.id))
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -98,14 +105,14 @@ def update_user(user_update: UserUpdate, db: Session, current_user: User):
     if user_update.email:
         db_user.email = user_update.email
     if user_update.password:
-        db_user.hashed_password = hash_password(user_update.password)
+        db_user.hashed_password = await hash_password_async(user_update.password)
     if user_update.phone:
         db_user.phone = user_update.phone
     if user_update.dob:
         db_user.dob = user_update.dob
     
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    invalidate_principal(db_user.id)
     
-    print(">>> Updating user:", db_user.username)
+    logger.info("User updated", extra={"user_id": db_user.id})
     return db_user
\ No newline at end of file
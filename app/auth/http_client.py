@@ -0,0 +1,48 @@
+import importlib.util
+import ssl
+from typing import Optional
+import httpx
+
+from app.config import settings
+
+# Client dùng chung cho mọi request tới Keycloak: giữ kết nối (keep-alive) giữa các lần gọi
+# thay vì bắt tay TCP/TLS lại mỗi lần đăng nhập. Mở/đóng theo lifespan của app.
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _verify_setting():
+    verify = settings.KEYCLOAK_HTTP_VERIFY
+    if verify.lower() in ("true", "1", "yes"):
+        return True
+    if verify.lower() in ("false", "0", "no"):
+        return False
+    return ssl.create_default_context(cafile=verify)  # Đường dẫn tới CA bundle
+
+
+def create_keycloak_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=f"{settings.KEYCLOAK_URL}/realms/{settings.KEYCLOAK_REALM}/protocol/openid-connect",
+        limits=httpx.Limits(
+            max_connections=settings.KEYCLOAK_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.KEYCLOAK_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.KEYCLOAK_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.KEYCLOAK_HTTP_TIMEOUT, connect=settings.KEYCLOAK_HTTP_CONNECT_TIMEOUT),
+        # HTTP/2 chỉ bật khi đã cài gói h2 (httpx[http2])
+        http2=settings.KEYCLOAK_HTTP2 and importlib.util.find_spec("h2") is not None,
+        verify=_verify_setting(),
+    )
+
+
+def get_keycloak_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_keycloak_client()
+    return _client
+
+
+async def close_keycloak_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
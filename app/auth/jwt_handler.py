@@ -1,72 +1,122 @@
-import base64
+import asyncio
+import hashlib
+import logging
+import time
 from fastapi import HTTPException, status
 import httpx
-from jose import JWTError, jwt
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import JWTError, jwk, jwt
+from app.auth.http_client import get_keycloak_client
 from app.config import settings
+from app.utils.cache import LRUCache
+from app.utils.metrics import JWKS_FETCH_SECONDS, TOKEN_VERIFY_SECONDS
 
-_jwks_cache = None
+logger = logging.getLogger(__name__)
 
-# Hàm lấy JWKS từ Keycloak
-async def get_jwks():
-    global _jwks_cache
-    if _jwks_cache is None:    
-        async with httpx.AsyncClient() as client:
+_jwks_cache = None      # JWKS thô lần tải gần nhất
+_signing_keys = {}      # kid -> khóa RSA đã parse sẵn (jose Key), dùng thẳng cho jwt.decode
+_keys_version = 0       # Tăng mỗi khi bộ khóa thay đổi (xoay khóa trên Keycloak)
+_fetched_at = 0.0
+_refresh_lock = asyncio.Lock()
+_background_refresh = None
+
+# Payload của các token đã xác minh, khóa theo SHA-256 của token, sống đến đúng exp
+_token_cache = LRUCache(settings.TOKEN_CACHE_SIZE)
+
+
+# Hàm tải JWKS từ Keycloak (không cache)
+async def fetch_jwks():
+    client = get_keycloak_client()
+    try:
+        with JWKS_FETCH_SECONDS.time():
+            response = await client.get("/certs")
+        response.raise_for_status() # Kiểm tra lỗi HTTP
+        jwks = response.json()
+        logger.info("JWKS fetched", extra={"keys": len(jwks.get("keys", []))})
+        return jwks
+    except httpx.HTTPError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch JWKS from Keycloak: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing JWKS: {str(e)}"
+        )
+
+
+# Parse các khóa ký RSA một lần khi tải JWKS thay vì ở mỗi request
+def parse_signing_keys(jwks: dict) -> dict:
+    keys = {}
+    for key in jwks.get("keys", []):
+        if key.get("kty") == "RSA" and key.get("use") == "sig" and key.get("kid"):
             try:
-                response = await client.get(f"{settings.KEYCLOAK_URL}/realms/{settings.KEYCLOAK_REALM}/protocol/openid-connect/certs")
-                response.raise_for_status() # Kiểm tra lỗi HTTP
-                jwks = response.json()
-                print(f"JWKS fetched: {len(jwks.get('keys', []))} keys")
-                _jwks_cache = jwks
-                return jwks
-            except httpx.HTTPError as e:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Failed to fetch JWKS from Keycloak: {str(e)}"
-                )
+                keys[key["kid"]] = jwk.construct(key, algorithm=key.get("alg", "RS256"))
             except Exception as e:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Error processing JWKS: {str(e)}"
-                )
-    return _jwks_cache
+                logger.warning("Skipping invalid JWK", extra={"kid": key.get("kid"), "error": str(e)})
+    return keys
 
 
-# Chuyển đổi JWK sang định dạng RSA
-def jwk_to_rsa_key(jwk):
+# Tải lại JWKS; các request đồng thời chờ chung một lần tải (single-flight)
+async def refresh_signing_keys():
+    global _jwks_cache, _signing_keys, _keys_version, _fetched_at
+    started_at = _fetched_at
+    async with _refresh_lock:
+        if _fetched_at != started_at:
+            return  # Một request khác vừa tải xong trong lúc chờ khóa
+        jwks = await fetch_jwks()
+        keys = parse_signing_keys(jwks)
+        if keys.keys() != _signing_keys.keys():
+            _keys_version += 1
+            _token_cache.clear()  # Bộ khóa đổi thì không tin các kết quả xác minh cũ nữa
+        _jwks_cache = jwks
+        _signing_keys = keys
+        _fetched_at = time.monotonic()
+
+
+async def _refresh_in_background():
+    global _background_refresh
     try:
-        n = jwk['n']
-        e = jwk['e']
+        await refresh_signing_keys()
+    except Exception as e:
+        # Giữ bộ khóa cũ, lần sau hết TTL sẽ thử lại
+        logger.warning("Background JWKS refresh failed", extra={"error": str(e)})
+    finally:
+        _background_refresh = None
 
-        # Add padding for base64 decoding
-        n += '=' * (4 - len(n) % 4)
-        e += '=' * (4 - len(e) % 4)
 
-        # Decode base64url
-        n_bytes = base64.urlsafe_b64decode(n)
-        e_bytes = base64.urlsafe_b64decode(e)
+async def get_signing_key(kid: str):
+    global _background_refresh
+    if not _signing_keys:
+        await refresh_signing_keys()
+    elif time.monotonic() - _fetched_at > settings.JWKS_CACHE_TTL and _background_refresh is None:
+        # Hết TTL: vẫn dùng khóa hiện có, làm mới ở nền để không chặn request
+        _background_refresh = asyncio.create_task(_refresh_in_background())
+
+    key = _signing_keys.get(kid)
+    if key is None and time.monotonic() - _fetched_at > settings.JWKS_MIN_REFRESH_INTERVAL:
+        # kid lạ: có thể Keycloak vừa xoay khóa, tải lại ngay (có giới hạn tần suất)
+        await refresh_signing_keys()
+        key = _signing_keys.get(kid)
+    return key
+
+
+# Hàm lấy JWKS từ Keycloak (có cache)
+async def get_jwks():
+    if _jwks_cache is None:
+        await refresh_signing_keys()
+    return _jwks_cache
 
-        # Convert bytes to integers
-        n_int = int.from_bytes(n_bytes, byteorder='big')
-        e_int = int.from_bytes(e_bytes, byteorder='big')
-        
-        # Create RSA public key
-        public_numbers = rsa.RSAPublicNumbers(e_int, n_int)
-        public_key = public_numbers.public_key()
-        
-        # Convert to PEM format
-        pem = public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
-        return pem.decode('utf-8')
-    except Exception as e:
-        raise ValueError(f"Invalid JWK: {e}")
-    
 
 # Hàm xác minh token
 async def verify_token(token: str):
+    start = time.perf_counter()
+    cache_key = hashlib.sha256(token.encode("utf-8")).digest()
+    cached = _token_cache.get(cache_key)
+    if cached is not None:
+        TOKEN_VERIFY_SECONDS.labels(cache="hit").observe(time.perf_counter() - start)
+        return dict(cached)
+
     try:
         unverified_header = jwt.get_unverified_header(token)
         kid = unverified_header.get("kid")
@@ -78,21 +128,8 @@ async def verify_token(token: str):
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        jwks = await get_jwks()
-
-        if not jwks or "keys" not in jwks:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="JWKS not available",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+        rsa_key = await get_signing_key(kid)
 
-        rsa_key = None
-        for key in jwks["keys"]:
-            if (key["kid"] == kid and key["kty"] == "RSA" and key["use"] == "sig"):
-                rsa_key = jwk_to_rsa_key(key)
-                break
-        
         if rsa_key is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -108,10 +145,14 @@ async def verify_token(token: str):
             options={"verify_signature": True, "verify_exp": True, "verify_aud": False}  # Có thể tắt verify_aud nếu không sử dụng
         )
 
-        print(f"Token audience: {payload.get('aud')}")
-        print(f"Expected client ID: {settings.KEYCLOAK_CLIENT_ID}")
+        # Đường nóng: chỉ dựng bản ghi khi bật DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Token verified", extra={"aud": payload.get("aud"), "client_id": settings.KEYCLOAK_CLIENT_ID})
+
+        if isinstance(payload.get("exp"), (int, float)):
+            _token_cache.set(cache_key, payload, expires_at=payload["exp"])
         
-        return payload
+        return dict(payload)
     
     except JWTError as e:
         raise HTTPException(
@@ -119,6 +160,8 @@ async def verify_token(token: str):
             detail=f"Invalid token: {str(e)}",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    finally:
+        TOKEN_VERIFY_SECONDS.labels(cache="miss").observe(time.perf_counter() - start)
             
 
 def get_user_info(payload: dict):
@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from app.config import settings
+from app.models.user import User
+from app.utils.cache import LRUCache
+
+
+# Ảnh chụp gọn, bất biến của user đã đăng nhập: đủ cho kiểm tra quyền và lọc theo user_id
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    role: Optional[str]
+    is_active: int
+    keycloak_roles: tuple = ()
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            role=user.role.name if user.role else None,
+            is_active=user.is_active
+        )
+
+
+# sub của Keycloak -> Principal; TTL ngắn để giới hạn độ trễ giữa các worker
+_principal_cache = LRUCache(settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL)
+
+
+def get_cached_principal(sub: str) -> Optional[Principal]:
+    return _principal_cache.get(sub)
+
+
+def cache_principal(sub: str, principal: Principal):
+    _principal_cache.set(sub, principal)
+
+
+# Gọi sau mỗi lần ghi vào bảng users (sửa thông tin, đổi quyền, xoá user)
+def invalidate_principal(user_id: int):
+    _principal_cache.pop_where(lambda principal: principal.id == user_id)
@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 
@@ -14,6 +15,60 @@ class Settings(BaseSettings):
     KEYCLOAK_CLIENT_SECRET: str
     
     DATABASE_URL: str
+    # Replica chỉ đọc (tuỳ chọn) và thời gian ghim user vào primary sau khi ghi
+    DATABASE_REPLICA_URL: Optional[str] = None
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Connection pool của client HTTP dùng chung tới Keycloak
+    KEYCLOAK_HTTP_MAX_CONNECTIONS: int = 100
+    KEYCLOAK_HTTP_MAX_KEEPALIVE: int = 20
+    KEYCLOAK_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    KEYCLOAK_HTTP_TIMEOUT: float = 10.0
+    KEYCLOAK_HTTP_CONNECT_TIMEOUT: float = 5.0
+    KEYCLOAK_HTTP2: bool = True
+    KEYCLOAK_HTTP_VERIFY: str = "true"  # true/false hoặc đường dẫn CA bundle
+
+    # Cache JWKS: thời gian sống (giây) và khoảng cách tối thiểu giữa hai lần tải lại vì kid lạ
+    JWKS_CACHE_TTL: int = 300
+    JWKS_MIN_REFRESH_INTERVAL: int = 10
+    # Số token đã xác minh được giữ trong cache (0 = tắt)
+    TOKEN_CACHE_SIZE: int = 10000
+    # Cache user cục bộ theo sub của Keycloak
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: int = 60
+
+    # Connection pool của SQLAlchemy (áp dụng riêng cho engine sync và engine async)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800  # Giây; nhỏ hơn wait_timeout của MySQL
+    DB_POOL_PRE_PING: bool = True
+
+    # Job nền đánh dấu lượt mượn quá hạn: chu kỳ (giây) và số dòng mỗi lô
+    OVERDUE_SWEEP_ENABLED: bool = True
+    OVERDUE_SWEEP_INTERVAL: int = 300
+    OVERDUE_SWEEP_BATCH_SIZE: int = 500
+
+    # Số id/bản ghi tối đa trong một request hàng loạt của admin
+    ADMIN_BATCH_MAX_SIZE: int = 10000
+
+    # Cache response của các danh sách catalog (sách, tác giả, thể loại): số bản lưu và thời gian sống (giây).
+    # TTL cũng là độ trễ tối đa để một worker thấy thay đổi do worker khác ghi.
+    CATALOG_CACHE_SIZE: int = 500
+    CATALOG_CACHE_TTL: int = 30
+
+    # Thread pool cho bcrypt: số luồng (= số việc hash chạy cùng lúc) và số request được xếp hàng chờ
+    HASH_WORKERS: int = 4
+    HASH_MAX_QUEUE: int = 200
+
+    # Debug: thêm header X-DB-* (số câu SQL, thời gian DB) vào mọi response
+    DEBUG: bool = False
+    # Log ghi qua hàng đợi bằng thread nền; LOG_FORMAT = json (mỗi dòng một JSON) hoặc text
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    # Câu SQL chạy lâu hơn ngưỡng (ms) được ghi log kèm kế hoạch EXPLAIN; 0 = tắt
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_EXPLAIN: bool = True
 
     class Config:
         env_file = ENV_PATH
@@ -1,11 +1,121 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from dotenv import load_dotenv
 import os
 
+from app.config import settings
+from app.utils.cache import LRUCache
+from app.utils.db_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+from app.utils.query_stats import instrument_engine
+
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Driver async tương ứng với driver sync trong DATABASE_URL
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+# Cấu hình pool lấy từ Settings. SQLite (dev/test) giữ pool mặc định của driver.
+def pool_options(url: str, poolclass) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,  # Đóng connection cũ trước khi chạm wait_timeout của MySQL
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL, InstrumentedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Engine async cho các route async: không chiếm luồng của threadpool khi chờ DB.
+# expire_on_commit=False để vẫn đọc được thuộc tính sau commit mà không phát sinh lazy load.
+async_engine = create_async_engine(to_async_url(DATABASE_URL),
+                                   **pool_options(DATABASE_URL, InstrumentedAsyncQueuePool))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Replica chỉ đọc cho catalog và lịch sử mượn; không cấu hình thì dùng luôn primary
+REPLICA_URL = settings.DATABASE_REPLICA_URL or DATABASE_URL
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_engine(REPLICA_URL, **pool_options(REPLICA_URL, InstrumentedQueuePool))
+    async_replica_engine = create_async_engine(to_async_url(REPLICA_URL),
+                                               **pool_options(REPLICA_URL, InstrumentedAsyncQueuePool))
+else:
+    replica_engine, async_replica_engine = engine, async_engine
+
+# Đếm câu SQL / thời gian DB theo request và ghi log câu chậm (xem app/utils/query_stats.py)
+for _engine in {engine, async_engine.sync_engine, replica_engine, async_replica_engine.sync_engine}:
+    instrument_engine(_engine)
+
+# User vừa ghi trên primary -> đọc từ primary thêm READ_YOUR_WRITES_SECONDS giây để không thấy dữ liệu cũ
+# do replica trễ. Map nằm trong process nên chỉ đúng khi request kế tiếp rơi vào cùng worker.
+_pinned_users = LRUCache(settings.PRINCIPAL_CACHE_SIZE, ttl=settings.READ_YOUR_WRITES_SECONDS)
+# id của user đang gọi request, do get_current_principal gán
+current_user_id: ContextVar = ContextVar("current_user_id", default=None)
+
+
+def pin_to_primary(user_id: int):
+    _pinned_users.set(user_id, True)
+
+
+def is_pinned_to_primary(user_id: int) -> bool:
+    return user_id is not None and _pinned_users.get(user_id) is not None
+
+
+class RoutingSession(Session):
+    """Session cho các route chỉ đọc: chọn replica, trừ khi đang flush hoặc user vừa ghi."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or is_pinned_to_primary(current_user_id.get()):
+            return engine
+        return replica_engine
+
+
+class AsyncRoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or is_pinned_to_primary(current_user_id.get()):
+            return async_engine.sync_engine
+        return async_replica_engine.sync_engine
+
+
+# Session đọc đang chạy trên replica (có thể còn trễ so với primary) hay không
+def reads_from_replica(db) -> bool:
+    session = getattr(db, "sync_session", db)
+    if not isinstance(session, (RoutingSession, AsyncRoutingSession)):
+        return False
+    return session.get_bind() not in (engine, async_engine.sync_engine)
+
+
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+AsyncReadSessionLocal = async_sessionmaker(sync_session_class=AsyncRoutingSession,
+                                           autoflush=False, expire_on_commit=False)
+
+
+# Commit trên session primary trong một request có user -> ghim user đó vào primary
+@event.listens_for(Session, "after_commit")
+def _pin_writer(session):
+    if isinstance(session, (RoutingSession, AsyncRoutingSession)):
+        return
+    user_id = current_user_id.get()
+    if user_id is not None:
+        pin_to_primary(user_id)
+
 Base = declarative_base()
\ No newline at end of file
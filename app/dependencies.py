@@ -1,27 +1,62 @@
+import logging
+from dataclasses import replace
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from app.database import (AsyncReadSessionLocal, AsyncSessionLocal, ReadSessionLocal, SessionLocal,
+                          current_user_id)
 from app.models import User
 from app.auth.jwt_handler import verify_token, get_user_info
+from app.auth.principal import Principal, cache_principal, get_cached_principal
 from app.config import settings
+from app.utils.metrics import DB_SESSION_SECONDS
 from datetime import datetime, timezone
 
 # Cấu hình OAuth2 với Keycloak
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
+logger = logging.getLogger(__name__)
+
 
 def get_db():
     db = SessionLocal()
     try:
-        yield db
+        with DB_SESSION_SECONDS.labels("sync", "primary").time():
+            yield db
+    finally:
+        db.close()
+
+
+# Session async cho các route async (sách, mượn sách, xác thực)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        with DB_SESSION_SECONDS.labels("async", "primary").time():
+            yield db
+
+
+# Session chỉ đọc: truy vấn chạy trên replica, trừ user vừa ghi (read-your-writes)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        with DB_SESSION_SECONDS.labels("sync", "read").time():
+            yield db
     finally:
         db.close()
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        with DB_SESSION_SECONDS.labels("async", "read").time():
+            yield db
+
+
+async def verify_user_info(token: str) -> dict:
     payload = await verify_token(token)
-    print("User info:", payload)
+    # Không ghi cả payload (email, tên... là dữ liệu cá nhân); chỉ sub, và chỉ khi bật DEBUG
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Token accepted", extra={"sub": payload.get("sub") if payload else None})
 
     if payload is None or "sub" not in payload:
         raise HTTPException(
@@ -31,27 +66,50 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     
     # Lấy thông tin user từ token
     user_info = get_user_info(payload)
-    keycloak_username = user_info.get("username")
     
-    if not keycloak_username:
+    if not user_info.get("username"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Username not found"
         )
-    
+    return user_info
+
+
+async def get_or_create_user(db: AsyncSession, user_info: dict) -> User:
     # Tìm user trong local DB
-    user = db.query(User).filter(User.username == keycloak_username).first()
+    user = await db.scalar(select(User).options(joinedload(User.role))
+                           .where(User.username == user_info["username"]))
     
     if user is None:
         # JIT User Provisioning - tạo user mới nếu chưa có
-        user = create_user_from_keycloak(db, user_info)
+        user = await create_user_from_keycloak(db, user_info)
+    return user
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
+    user_info = await verify_user_info(token)
+    user = await get_or_create_user(db, user_info)
+    current_user_id.set(user.id)
     
     user.keycloak_roles = user_info.get("roles", [])
     user.keycloak_info = user_info
     
     return user
 
-def create_user_from_keycloak(db: Session, user_info: dict) -> User:
+
+# Chỉ cần id và quyền: lấy từ cache theo sub, không truy vấn bảng users khi cache còn
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    user_info = await verify_user_info(token)
+
+    principal = get_cached_principal(user_info["sub"])
+    if principal is None:
+        principal = Principal.from_user(await get_or_create_user(db, user_info))
+        cache_principal(user_info["sub"], principal)
+    current_user_id.set(principal.id)
+
+    return replace(principal, keycloak_roles=tuple(user_info.get("roles", [])))
+
+async def create_user_from_keycloak(db: AsyncSession, user_info: dict) -> User:
     """JIT User Provisioning"""
     
     # Tạo user mới từ thông tin Keycloak
@@ -68,19 +126,19 @@ def create_user_from_keycloak(db: Session, user_info: dict) -> User:
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user, ["role"])
     
     return new_user
 
 
-async def require_admin(current_user: User = Depends(get_current_user)):
+async def require_admin(current_user: Principal = Depends(get_current_principal)):
     # Kiểm tra role từ Keycloak
-    if hasattr(current_user, 'keycloak_roles') and "admin" in current_user.keycloak_roles:
+    if "admin" in current_user.keycloak_roles:
         return current_user
     
     # Fallback: kiểm tra role từ local DB
-    if current_user.role and current_user.role.name == "admin":
+    if current_user.role == "admin":
         return current_user
     
     raise HTTPException(
@@ -89,13 +147,13 @@ async def require_admin(current_user: User = Depends(get_current_user)):
     )
 
 
-async def require_user(current_user: User = Depends(get_current_user)):
+async def require_user(current_user: Principal = Depends(get_current_principal)):
     # Kiểm tra role từ Keycloak
-    if hasattr(current_user, 'keycloak_roles') and "user" in current_user.keycloak_roles:
+    if "user" in current_user.keycloak_roles:
         return current_user
     
     # Fallback: kiểm tra role từ local DB
-    if current_user.role and current_user.role.name == "user":
+    if current_user.role == "user":
         return current_user
     
     raise HTTPException(
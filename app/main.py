@@ -1,27 +1,48 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import Depends, FastAPI
 from fastapi_pagination import add_pagination
 from starlette.responses import RedirectResponse
 from starlette.middleware.cors import CORSMiddleware
 
+from app.auth.http_client import close_keycloak_client, get_keycloak_client
 from app.auth.jwt_handler import verify_token
 from app.routes.admin import author_a, book_a, category_a, user_manage_a
 from app.routes.user import user_u, book_u, category_u, borrow_u
-from app.routes import auth
-from app.seed import seed_data
+from app.routes import auth, health
+from app.utils.hashing import shutdown_hashing
+from app.utils.overdue import run_overdue_sweeper
+from app.utils.log import RequestIdMiddleware, setup_logging
+from app.utils.metrics import MetricsMiddleware, mark_process_dead, metrics_response
+from app.utils.query_stats import QueryStatsMiddleware
 from app.config import settings
 from app import database
 
-def init_db():
-    database.Base.metadata.create_all(bind=database.engine)
-    db = database.SessionLocal()
-    seed_data(db)
-    db.close()
+setup_logging()
+
+# Schema do Alembic quản lý: chạy "python -m app.manage migrate" (và "seed" lần đầu) trước khi khởi động app
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_keycloak_client()
+    sweeper = asyncio.create_task(run_overdue_sweeper()) if settings.OVERDUE_SWEEP_ENABLED else None
+    yield
+    if sweeper:
+        sweeper.cancel()
+        with suppress(asyncio.CancelledError):
+            await sweeper
+    await close_keycloak_client()
+    shutdown_hashing()
+    await database.async_engine.dispose()
+    await database.async_replica_engine.dispose()
+    mark_process_dead()
 
-init_db()
 
 app = FastAPI(
     title="Library Management System",
     description="A simple library management system API built with FastAPI",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -30,7 +51,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Request-ID", "X-DB-Query-Count", "X-DB-Time-Ms", "X-DB-Slowest-Ms"],
 )
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)  # Ngoài cùng: mọi log phía trong đều có request id
 
 app.include_router(
     user_u.router,
@@ -78,6 +103,12 @@ app.include_router(
     tags=["user - auth"]
 )
 
+app.include_router(
+    health.router,
+    prefix="/health",
+    tags=["health"]
+)
+
 add_pagination(app)
 
 
@@ -85,6 +116,11 @@ add_pagination(app)
 def root():
     return {"message": "Welcome to the Library Management System."}
 
+# Số liệu Prometheus; chạy nhiều worker thì đặt PROMETHEUS_MULTIPROC_DIR để gộp số liệu của mọi worker
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
+
 @app.get("/protected")
 async def protected_route(user=Depends(verify_token)):
     return {"message": f"Hello, {user.username}. This is a protected route."}
\ No newline at end of file
@@ -0,0 +1,160 @@
+# CLI quản trị: migration schema, seed dữ liệu, dựng lại chỉ mục tìm kiếm.
+# App không tự chạy DDL khi import; chạy lệnh này trước khi khởi động (hoặc khi deploy):
+#
+#   python -m app.manage migrate                 # nâng schema lên bản mới nhất
+#   python -m app.manage downgrade <revision>
+#   python -m app.manage stamp <revision>        # database có sẵn bảng từ create_all: đánh dấu 0001
+#   python -m app.manage revision -m "..." [--autogenerate]
+#   python -m app.manage current | history
+#   python -m app.manage seed                    # dữ liệu mẫu
+#   python -m app.manage seed --books 1000000 --users 100000 --borrows 10000000   # dữ liệu cho benchmark
+#   python -m app.manage rebuild-search
+#   python -m app.manage import-books catalog.csv [--format csv|ndjson] [--no-create-authors]
+#   python -m app.manage export-books [books.ndjson] [--format csv|ndjson]
+import argparse
+import os
+import sys
+
+from alembic import command
+from alembic.config import Config
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def alembic_config() -> Config:
+    return Config(os.path.join(BASE_DIR, "alembic.ini"))
+
+
+def seed(args):
+    from app.database import SessionLocal
+    from app.seed import seed_data, seed_scale
+    from app.utils.search import ensure_search_index
+
+    db = SessionLocal()
+    try:
+        if args.books or args.users or args.borrows or args.authors:
+            seed_scale(db, books=args.books, users=args.users, borrows=args.borrows, authors=args.authors,
+                       batch_size=args.batch_size, seed=args.random_seed)
+        else:
+            seed_data(db)
+        ensure_search_index(db)
+    finally:
+        db.close()
+
+
+# Bảng book_search vừa được tạo trên database đã có sách thì dựng chỉ mục ngay
+def ensure_search():
+    from app.database import SessionLocal
+    from app.utils.search import ensure_search_index
+
+    db = SessionLocal()
+    try:
+        ensure_search_index(db)
+    finally:
+        db.close()
+
+
+def rebuild_search():
+    from app.database import SessionLocal
+    from app.utils.search import rebuild_search_index
+
+    db = SessionLocal()
+    try:
+        print(f"Indexed {rebuild_search_index(db)} books")
+    finally:
+        db.close()
+
+
+def import_books(args):
+    from app.database import SessionLocal
+    from app.utils import book_io
+
+    fmt = args.format or book_io.detect_format(args.path)
+    if fmt is None:
+        sys.exit("Unknown file format, use --format csv or --format ndjson")
+    db = SessionLocal()
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as lines:
+            result = book_io.import_books(db, book_io.read_rows(lines, fmt), args.create_authors)
+    finally:
+        db.close()
+    for error in result["errors"]:
+        print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+    print(f"Imported {result['imported']} books, {result['failed']} rows failed")
+
+
+def export_books(args):
+    from app.utils import book_io
+
+    fmt = args.format or (book_io.detect_format(args.path) if args.path else "csv") or "csv"
+    output = open(args.path, "w", encoding="utf-8", newline="") if args.path else sys.stdout
+    try:
+        for chunk in book_io.stream_export(fmt):
+            output.write(chunk)
+    finally:
+        if args.path:
+            output.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="Upgrade the schema (default: to head)")
+    migrate.add_argument("revision", nargs="?", default="head")
+    migrate.add_argument("--sql", action="store_true", help="Print the SQL instead of running it")
+    downgrade = commands.add_parser("downgrade", help="Downgrade the schema to a revision")
+    downgrade.add_argument("revision")
+    stamp = commands.add_parser("stamp", help="Mark the database as being at a revision without running DDL")
+    stamp.add_argument("revision")
+    revision = commands.add_parser("revision", help="Create a new migration script")
+    revision.add_argument("-m", "--message", required=True)
+    revision.add_argument("--autogenerate", action="store_true")
+    commands.add_parser("current", help="Show the current revision")
+    commands.add_parser("history", help="List migrations")
+    seed_parser = commands.add_parser("seed", help="Insert missing sample data; with counts, top tables up for benchmarks")
+    seed_parser.add_argument("--books", type=int, default=0, help="Minimum number of books")
+    seed_parser.add_argument("--users", type=int, default=0, help="Minimum number of users")
+    seed_parser.add_argument("--borrows", type=int, default=0, help="Minimum number of borrows")
+    seed_parser.add_argument("--authors", type=int, default=0, help="Minimum number of authors")
+    seed_parser.add_argument("--batch-size", type=int, default=10_000)
+    seed_parser.add_argument("--random-seed", type=int, default=42)
+    commands.add_parser("rebuild-search", help="Rebuild the book search index")
+    import_parser = commands.add_parser("import-books", help="Import books from a CSV or NDJSON file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension")
+    import_parser.add_argument("--no-create-authors", dest="create_authors", action="store_false",
+                               help="Reject rows whose authors do not exist instead of creating them")
+    export_parser = commands.add_parser("export-books", help="Export all books as CSV or NDJSON")
+    export_parser.add_argument("path", nargs="?", help="Output file (default: stdout)")
+    export_parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension, else csv")
+
+    args = parser.parse_args(argv)
+    config = alembic_config()
+
+    if args.command == "migrate":
+        command.upgrade(config, args.revision, sql=args.sql)
+        if not args.sql and args.revision == "head":
+            ensure_search()
+    elif args.command == "downgrade":
+        command.downgrade(config, args.revision)
+    elif args.command == "stamp":
+        command.stamp(config, args.revision)
+    elif args.command == "revision":
+        command.revision(config, message=args.message, autogenerate=args.autogenerate)
+    elif args.command == "current":
+        command.current(config, verbose=True)
+    elif args.command == "history":
+        command.history(config)
+    elif args.command == "seed":
+        seed(args)
+    elif args.command == "rebuild-search":
+        rebuild_search()
+    elif args.command == "import-books":
+        import_books(args)
+    elif args.command == "export-books":
+        export_books(args)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -4,4 +4,5 @@ from .category import Category
 from .author import Author
 from .book_author import BookAuthor
 from .role import Role
-from .borrow import Borrow, BorrowStatus
\ No newline at end of file
+from .borrow import Borrow, BorrowStatus
+from .book_search import BookSearch
\ No newline at end of file
@@ -18,4 +18,11 @@ class Book(Base):
     category_id = Column(Integer, ForeignKey("categories.id"))
     category = relationship("Category", back_populates="books")
 
-    book_authors = relationship("BookAuthor", back_populates="book", cascade="all, delete")
\ No newline at end of file
+    book_authors = relationship("BookAuthor", back_populates="book", cascade="all, delete")
+    # Tác giả phụ đi thẳng qua bảng book_authors, chỉ để đọc (ghi qua book_authors)
+    authors = relationship("Author", secondary="book_authors", viewonly=True)
+
+    # Tên thể loại cho BookResponse (validate từ ORM); property thường rẻ hơn association_proxy
+    @property
+    def category_name(self):
+        return self.category.name if self.category else None
\ No newline at end of file
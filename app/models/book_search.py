@@ -0,0 +1,24 @@
+from sqlalchemy import DDL, Column, Index, Integer, Text, event
+from ..database import Base
+
+class BookSearch(Base):
+    # Tài liệu tìm kiếm đã bỏ dấu của mỗi sách (tiêu đề, mô tả, tác giả chính và tác giả phụ)
+    __tablename__ = "book_search"
+    book_id = Column(Integer, primary_key=True, autoincrement=False)
+    document = Column(Text, nullable=False, default="")
+
+    __table_args__ = (
+        Index("ix_book_search_document", "document", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
+
+
+# SQLite không có FULLTEXT, dùng bảng ảo FTS5 (rowid = book_id) làm chỉ mục thay thế
+event.listen(
+    BookSearch.__table__, "after_create",
+    DDL("CREATE VIRTUAL TABLE IF NOT EXISTS book_search_fts USING fts5(document, prefix='2 3')")
+    .execute_if(dialect="sqlite")
+)
+event.listen(
+    BookSearch.__table__, "after_drop",
+    DDL("DROP TABLE IF EXISTS book_search_fts").execute_if(dialect="sqlite")
+)
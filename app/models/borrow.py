@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Enum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 import enum
 
@@ -9,8 +9,22 @@ class BorrowStatus(enum.Enum):
     returned = "returned"
     overdue = "overdue"
 
+# Các trạng thái sách còn ở chỗ người mượn
+ACTIVE_BORROW_STATUSES = (BorrowStatus.borrowing, BorrowStatus.overdue)
+
 class Borrow(Base):
     __tablename__ = "borrows"
+    # Mỗi user chỉ có một lượt mượn đang hiệu lực cho mỗi cuốn sách. active = True khi đang mượn/quá hạn
+    # và NULL khi đã trả; NULL không trùng nhau trong unique index nên lịch sử trả sách không bị chặn.
+    __table_args__ = (
+        UniqueConstraint("user_id", "book_id", "active", name="uq_borrows_user_book_active"),
+        # Sách đang mượn / lịch sử của một user, sắp theo ngày mượn
+        Index("ix_borrows_user_status_borrow_date", "user_id", "status", "borrow_date"),
+        # Kiểm tra user đã mượn cuốn này chưa
+        Index("ix_borrows_user_book_status", "user_id", "book_id", "status"),
+        # Cho job quét quá hạn: WHERE status = 'borrowing' AND due_date < now ORDER BY due_date
+        Index("ix_borrows_status_due_date", "status", "due_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
@@ -21,6 +35,7 @@ class Borrow(Base):
     return_date = Column(DateTime, nullable=True) # Sẽ null cho đến khi sách được trả
     
     status = Column(Enum(BorrowStatus), default=BorrowStatus.borrowing, nullable=False)
+    active = Column(Boolean, default=True, nullable=True)
 
     # SQLAlchemy relationships
     book = relationship("Book")
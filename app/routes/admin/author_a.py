@@ -1,27 +1,41 @@
+import logging
 from datetime import datetime, timezone
 from typing import Literal
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, status
 from fastapi_pagination import Page, add_pagination, paginate
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
 
 from app import dependencies, models
+from app.config import settings
 from app.dependencies import get_db
 from app.models.author import Author
-from app.models.user import User
-from app.schemas.author import AuthorCreate, AuthorResponse, AuthorUpdate
+from app.auth.principal import Principal
+from app.schemas.author import AuthorBatchUpdate, AuthorCreate, AuthorResponse, AuthorUpdate
+from app.schemas.batch import BatchDelete, BatchResult
+from app.schemas.pagination import CursorPage
+from app.utils.catalog_cache import cached_catalog_response, catalog_cache_key, catalog_response
+from app.utils.batch import existing_ids, reject_duplicates, require_all_found, unique_ids
+from app.utils.pagination import CURSOR_DEFAULT_SIZE, CURSOR_MAX_SIZE, keyset_paginate
+from app.utils.search import refresh_book_documents
 
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 add_pagination(router)
 
 # Get all authors
 @router.get("/", response_model=Page[AuthorResponse])
-def get_authors(name: str = Query(None, description="Search by author's name"),
+def get_authors(request: Request,
+                name: str = Query(None, description="Search by author's name"),
                 db: Session = Depends(get_db),
-                current_user: User = Depends(dependencies.require_admin),
+                current_user: Principal = Depends(dependencies.require_admin),
                 order_by: Literal["id", "name"] = Query("id"),
                 sort: Literal["asc", "desc"] = Query("asc")):
+    key = catalog_cache_key(request)
+    if (cached := cached_catalog_response(request, key)) is not None:
+        return cached
     column = {
         "id": models.Author.id,
         "name": models.Author.name
@@ -37,13 +51,40 @@ def get_authors(name: str = Query(None, description="Search by author's name"),
 
     if not authors:
         raise HTTPException(status_code=404, detail="No authors found")
-    return paginate(authors)
+    return catalog_response(request, key, paginate(authors), db)
+
+
+# Get authors with keyset (cursor) pagination
+@router.get("/cursor", response_model=CursorPage[AuthorResponse])
+def get_authors_cursor(request: Request,
+                       name: str = Query(None, description="Search by author's name"),
+                       db: Session = Depends(get_db),
+                       current_user: Principal = Depends(dependencies.require_admin),
+                       order_by: Literal["id", "name"] = Query("id"),
+                       sort: Literal["asc", "desc"] = Query("asc"),
+                       cursor: str = Query(None, description="next_cursor of the previous page"),
+                       size: int = Query(CURSOR_DEFAULT_SIZE, ge=1, le=CURSOR_MAX_SIZE)):
+    key = catalog_cache_key(request)
+    if (cached := cached_catalog_response(request, key)) is not None:
+        return cached
+    column = {
+        "id": models.Author.id,
+        "name": models.Author.name
+    }
+
+    query = select(models.Author)
+    if name:
+        query = query.where(models.Author.name.ilike(f"%{name}%"))
+
+    page = keyset_paginate(db, query, column[order_by], models.Author.id,
+                           order_by, sort, cursor, size)
+    return catalog_response(request, key, page, db)
 
 
 # Create a new author
 @router.post("/add", response_model=AuthorResponse)
 def add_author(author: AuthorCreate, db: Session = Depends(get_db),
-               current_user: User = Depends(dependencies.require_admin)):
+               current_user: Principal = Depends(dependencies.require_admin)):
     new_author = Author(
         name=author.name,
         created_at=datetime.now(timezone.utc),
@@ -52,19 +93,12 @@ def add_author(author: AuthorCreate, db: Session = Depends(get_db),
     db.add(new_author)
     db.commit()
     db.refresh(new_author)
-
-    author_response = AuthorResponse(
-        id=new_author.id,
-        name=new_author.name,
-        created_at=datetime.now(timezone.utc),
-        updated_at=datetime.now(timezone.utc)
-    )
-    return author_response
+    return AuthorResponse.model_validate(new_author)
 
 # Update author info
 @router.put("/update/{author_id}", response_model=AuthorResponse)
 def update_author(author_id: int, author: AuthorUpdate, db: Session = Depends(get_db),
-               current_user: User = Depends(dependencies.require_admin)):
+               current_user: Principal = Depends(dependencies.require_admin)):
     db_author = db.query(models.Author).filter(models.Author.id == author_id).first()
     if not db_author:
         raise HTTPException(status_code=404, detail="Author not found")
@@ -74,24 +108,62 @@ def update_author(author_id: int, author: AuthorUpdate, db: Session = Depends(ge
     db_author.updated_at = datetime.now(timezone.utc)
     db.commit()
     db.refresh(db_author)
-
-    author_response = AuthorResponse(
-        id=db_author.id,
-        name=db_author.name,
-        created_at=db_author.created_at,
-        updated_at=db_author.updated_at
-    )
-    return author_response
+    return AuthorResponse.model_validate(db_author)
 
 # Delete author info
 @router.delete("/delete/{author_id}", status_code=200)
 def delete_author(author_id: int, db: Session = Depends(get_db),
-               current_user: User = Depends(dependencies.require_admin)):
+               current_user: Principal = Depends(dependencies.require_admin)):
     db_author = db.query(models.Author).filter(models.Author.id == author_id).first()
     if not db_author:
         raise HTTPException(status_code=404, detail="Author not found")
     
     db.delete(db_author)
     db.commit()
-    print(f"Author with ID {author_id} deleted successfully.")
-    return {"detail": "Author deleted successfully"}
\ No newline at end of file
+    logger.info("Author deleted", extra={"author_id": author_id})
+    return {"detail": "Author deleted successfully"}
+
+
+# Sách có tên tác giả (chính hoặc phụ) trong chỉ mục tìm kiếm
+def _books_of_authors(db: Session, author_ids) -> list:
+    return db.scalars(
+        select(models.Book.id).where(models.Book.main_author_id.in_(author_ids))
+        .union(select(models.BookAuthor.book_id).where(models.BookAuthor.author_id.in_(author_ids)))
+    ).all()
+
+
+# Update many authors in one transaction
+@router.put("/batch/update", response_model=BatchResult)
+def update_authors(patches: list[AuthorBatchUpdate] = Body(..., min_length=1, max_length=settings.ADMIN_BATCH_MAX_SIZE),
+                   db: Session = Depends(get_db),
+                   current_user: Principal = Depends(dependencies.require_admin)):
+    ids = [patch.id for patch in patches]
+    reject_duplicates(ids, "author")
+    require_all_found(ids, existing_ids(db, Author.id, ids), "Authors")
+
+    now = datetime.now(timezone.utc)
+    db.execute(update(Author), [{**patch.model_dump(exclude_unset=True), "updated_at": now} for patch in patches])
+    # Bulk UPDATE không qua event after_flush của ORM: tự cập nhật chỉ mục tìm kiếm
+    renamed = [patch.id for patch in patches if "name" in patch.model_fields_set]
+    if renamed:
+        refresh_book_documents(db.connection(), _books_of_authors(db, renamed))
+    db.commit()
+    return {"detail": "Authors updated successfully", "count": len(ids)}
+
+
+# Delete many authors in one transaction.
+# Giống xoá từng tác giả: gỡ khỏi book_authors, sách có tác giả chính bị xoá giữ lại với main_author_id = NULL
+@router.post("/batch/delete", response_model=BatchResult)
+def delete_authors(batch: BatchDelete, db: Session = Depends(get_db),
+                   current_user: Principal = Depends(dependencies.require_admin)):
+    ids = unique_ids(batch.ids)
+    require_all_found(ids, existing_ids(db, Author.id, ids), "Authors")
+
+    book_ids = _books_of_authors(db, ids)
+    db.execute(delete(models.BookAuthor).where(models.BookAuthor.author_id.in_(ids)))
+    db.execute(update(models.Book).where(models.Book.main_author_id.in_(ids)).values(main_author_id=None),
+               execution_options={"synchronize_session": False})
+    db.execute(delete(Author).where(Author.id.in_(ids)), execution_options={"synchronize_session": False})
+    refresh_book_documents(db.connection(), book_ids)
+    db.commit()
+    return {"detail": "Authors deleted successfully", "count": len(ids)}
\ No newline at end of file
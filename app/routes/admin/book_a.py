@@ -1,92 +1,96 @@
+import logging
+import io
 from datetime import datetime, timezone
 from typing import Literal
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi_pagination import Page, add_pagination, paginate
-from sqlalchemy import or_
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Body, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.responses import StreamingResponse
+from fastapi_pagination import Page, add_pagination
+from fastapi_pagination.ext.sqlalchemy import apaginate
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
 from app import dependencies, models
 from app.models.book import Book
-from app.models.user import User
-from app.routes.admin.user_manage_a import get_db
-from app.schemas.book import BookCreate, BookResponse, BookUpdate
+from app.auth.principal import Principal
+from app.config import settings
+from app.dependencies import get_async_db, get_db
+from app.schemas.batch import BatchDelete, BatchResult
+from app.schemas.book import BookBatchUpdate, BookCreate, BookImportResult, BookResponse, BookUpdate
+from app.utils import book_io
+from app.utils.batch import chunked, conflict, existing_ids_async, reject_duplicates, require_all_found, unique_ids
+from app.schemas.pagination import CursorPage
+from app.utils.catalog_cache import cached_catalog_response, catalog_cache_key, catalog_response
+from app.utils.book_query import BOOK_ORDER_COLUMNS, book_load_options, build_book_query, books_to_response
+from app.utils.pagination import CURSOR_DEFAULT_SIZE, CURSOR_MAX_SIZE, keyset_paginate_async
+from app.utils.search import INDEXED_BOOK_FIELDS, refresh_book_documents, remove_book_documents
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Số id/cặp (book_id, author_id) mỗi câu IN khi đồng bộ tác giả phụ (giới hạn số tham số của SQLite)
+SYNC_CHUNK_SIZE = 1000
 
 add_pagination(router)
 
 # Get all books
 @router.get("/", response_model=Page[BookResponse])
-def get_books(title: str = Query(None, description="Search books by title"),
-              author: str = Query(None, description="Search books by author"),
-              category: str = Query(None, description="Search books by category"),
-              db: Session = Depends(get_db), 
-              current_user: User = Depends(dependencies.require_admin),
-              order_by: Literal["id", "title"] = Query("id"),
-              sort: Literal["asc", "desc"] = Query("asc")):
-    column = {
-        "id": models.Book.id,
-        "title": models.Book.title
-    }
-
-    order_column = column.get(order_by, models.Book.id)
-
-    if sort == "desc":
-        order_column = order_column.desc()
-    elif sort == "asc":
-        order_column = order_column.asc()
-
-    query = db.query(models.Book)\
-            .options(joinedload(models.Book.main_author),
-                     joinedload(models.Book.book_authors).joinedload(models.BookAuthor.author),
-                     joinedload(models.Book.category)
-                     )\
-            .group_by(models.Book.id)\
-            .order_by(order_column)
-    
-    if title:
-        query = query.filter(models.Book.title.ilike(f"%{title}%"))
-    if author:
-        subquery = db.query(models.BookAuthor.book_id)\
-                    .join(models.Author)\
-                    .filter(models.Author.name.ilike(f"%{author}%"))\
-                    .subquery()
-        query = query.outerjoin(models.Book.main_author)\
-                    .filter(
-                        or_(
-                            models.Author.name.ilike(f"%{author}%"),
-                            models.Book.id.in_(subquery)
-                        )
-                    )
-    if category:
-        query = query.filter(models.Book.category.has(models.Category.name.ilike(f"%{category}%")))
-    
-    books = query.all()
-    if not books:
+async def get_books(request: Request,
+                    q: str = Query(None, description="Full-text search over title, description and authors"),
+                    title: str = Query(None, description="Search books by title"),
+                    author: str = Query(None, description="Search books by author"),
+                    category: str = Query(None, description="Search books by category"),
+                    db: AsyncSession = Depends(get_async_db), 
+                    current_user: Principal = Depends(dependencies.require_admin),
+                    order_by: Literal["relevance", "id", "title"] = Query(None, description="Defaults to relevance when q is set, id otherwise"),
+                    sort: Literal["asc", "desc"] = Query("asc")):
+    key = catalog_cache_key(request)
+    if (cached := cached_catalog_response(request, key)) is not None:
+        return cached
+    query = build_book_query(title, author, category, order_by, sort,
+                             q=q, dialect=db.get_bind().dialect.name)
+
+    # LIMIT/OFFSET + COUNT chạy trong SQL, chỉ các sách của trang hiện tại được nạp
+    page = await apaginate(db, query, transformer=books_to_response)
+    if not page.total:
         raise HTTPException(status_code=404, detail="No books found")
-    
-    book_response = []
-    for book in books:
-        book_response.append(BookResponse(
-            id=book.id,
-            title=book.title,
-            main_author=book.main_author,
-            authors=[ba.author for ba in book.book_authors],
-            description=book.description,
-            quantity=book.quantity,
-            created_at=datetime.now(timezone.utc),
-            updated_at=datetime.now(timezone.utc),
-            category_id=book.category_id,
-            category=book.category.name if book.category else None
-        ))
-    return paginate(book_response)
+    return catalog_response(request, key, page, db)
+
+
+# Get books with keyset (cursor) pagination
+@router.get("/cursor", response_model=CursorPage[BookResponse])
+async def get_books_cursor(request: Request,
+                           q: str = Query(None, description="Full-text search over title, description and authors"),
+                           title: str = Query(None, description="Search books by title"),
+                           author: str = Query(None, description="Search books by author"),
+                           category: str = Query(None, description="Search books by category"),
+                           db: AsyncSession = Depends(get_async_db),
+                           current_user: Principal = Depends(dependencies.require_admin),
+                           order_by: Literal["id", "title"] = Query("id"),
+                           sort: Literal["asc", "desc"] = Query("asc"),
+                           cursor: str = Query(None, description="next_cursor of the previous page"),
+                           size: int = Query(CURSOR_DEFAULT_SIZE, ge=1, le=CURSOR_MAX_SIZE)):
+    key = catalog_cache_key(request)
+    if (cached := cached_catalog_response(request, key)) is not None:
+        return cached
+    query = build_book_query(title, author, category, q=q, dialect=db.get_bind().dialect.name)
+    page = await keyset_paginate_async(db, query, BOOK_ORDER_COLUMNS[order_by], models.Book.id,
+                                       order_by, sort, cursor, size, transformer=books_to_response)
+    return catalog_response(request, key, page, db)
+
+
+# Đọc lại sách cùng các quan hệ cho response (AsyncSession không lazy load được)
+async def _load_book(db: AsyncSession, book_id: int) -> Book:
+    return await db.scalar(select(Book).options(*book_load_options())
+                           .where(Book.id == book_id)
+                           .execution_options(populate_existing=True))
 
 
 # Create a new book
 @router.post("/add", response_model=BookResponse)
-def add_book(book: BookCreate, db: Session = Depends(get_db), 
-             current_user: User = Depends(dependencies.require_admin)):
-    category = db.query(models.Category).filter(models.Category.id == book.category_id).first()
+async def add_book(book: BookCreate, db: AsyncSession = Depends(get_async_db), 
+                   current_user: Principal = Depends(dependencies.require_admin)):
+    category = await db.get(models.Category, book.category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
@@ -100,90 +104,168 @@ def add_book(book: BookCreate, db: Session = Depends(get_db),
         category_id=book.category_id
     )
     db.add(new_book)
-    db.commit()
-    db.refresh(new_book)
+    await db.commit()
 
     # Thêm các tác giả phụ nếu có
     if book.book_authors:
         for author_id in book.book_authors:
             book_author = models.BookAuthor(book_id=new_book.id, author_id=author_id)
             db.add(book_author)
-        db.commit()
-
-    book_response = BookResponse(
-        id=new_book.id,
-        title=new_book.title,
-        main_author=new_book.main_author,
-        authors=[ba.author for ba in new_book.book_authors],
-        description=new_book.description,
-        quantity=new_book.quantity,
-        created_at=datetime.now(timezone.utc),
-        updated_at=datetime.now(timezone.utc),
-        category_id=new_book.category_id,
-        category=new_book.category.name if new_book.category else None
-    )
-    return book_response
+        await db.commit()
+
+    return BookResponse.model_validate(await _load_book(db, new_book.id))
+
+
+# Đưa tác giả phụ của mỗi sách về đúng tập mong muốn {book_id: {author_id}}: so với các dòng hiện có
+# và chỉ xoá/chèn phần chênh lệch (không commit). Trả về id các sách có thay đổi
+async def _sync_book_authors(db: AsyncSession, wanted: dict) -> set:
+    current = {}
+    for chunk in chunked(list(wanted), SYNC_CHUNK_SIZE):
+        rows = await db.execute(select(models.BookAuthor.book_id, models.BookAuthor.author_id)
+                                .where(models.BookAuthor.book_id.in_(chunk)))
+        for book_id, author_id in rows:
+            current.setdefault(book_id, set()).add(author_id)
+
+    removed = [(book_id, author_id) for book_id, author_ids in wanted.items()
+               for author_id in current.get(book_id, set()) - author_ids]
+    added = [{"book_id": book_id, "author_id": author_id} for book_id, author_ids in wanted.items()
+             for author_id in author_ids - current.get(book_id, set())]
+    for chunk in chunked(removed, SYNC_CHUNK_SIZE):
+        await db.execute(delete(models.BookAuthor)
+                         .where(tuple_(models.BookAuthor.book_id, models.BookAuthor.author_id).in_(chunk)),
+                         execution_options={"synchronize_session": False})
+    if added:
+        await db.execute(insert(models.BookAuthor), added)
+    return {book_id for book_id, _ in removed} | {row["book_id"] for row in added}
 
 
 # Update book details
 @router.put("/update/{book_id}", response_model=BookResponse)
-def update_book(book_id: int, book_data: BookUpdate, db: Session = Depends(get_db), 
-                current_user: User = Depends(dependencies.require_admin)):
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
+async def update_book(book_id: int, book_data: BookUpdate, db: AsyncSession = Depends(get_async_db), 
+                      current_user: Principal = Depends(dependencies.require_admin)):
+    book = await db.get(models.Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
     # Kiểm tra nếu category_id được thay đổi
     if book_data.category_id is not None:
-        category = db.query(models.Category).filter(models.Category.id == book_data.category_id).first()
+        category = await db.get(models.Category, book_data.category_id)
         if not category:
             raise HTTPException(status_code=404, detail="Category not found")
-    else:
-        category = book.category  # Giữ lại category hiện tại để trả response
+
+    # Kiểm tra mọi tác giả (chính và phụ) bằng một câu IN
+    author_ids = unique_ids(([book_data.main_author_id] if book_data.main_author_id is not None else [])
+                            + (book_data.book_authors or []))
+    if author_ids:
+        require_all_found(author_ids, await existing_ids_async(db, models.Author.id, author_ids), "Authors")
 
     for key, value in book_data.dict(exclude_unset=True).items():
         if key != "book_authors":
             setattr(book, key, value)
     book.updated_at = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(book)
 
-    # Cập nhật các tác giả phụ nếu có
+    # Chỉ thêm/xoá các tác giả phụ thay đổi, cùng transaction với phần sửa thông tin sách
     if book_data.book_authors is not None:
-        # Xoá các tác giả phụ hiện tại
-        db.query(models.BookAuthor).filter(models.BookAuthor.book_id == book.id).delete()
-        db.commit()
-
-        # Thêm các tác giả phụ mới
-        for author_id in book_data.book_authors:
-            book_author = models.BookAuthor(book_id=book.id, author_id=author_id)
-            db.add(book_author)
-        db.commit()
+        changed = await _sync_book_authors(db, {book.id: set(book_data.book_authors)})
+        if changed:
+            await db.run_sync(lambda session: refresh_book_documents(session.connection(), changed))
+    await db.commit()
 
-    book_response = BookResponse(
-        id=book.id,
-        title=book.title,
-        main_author=book.main_author,
-        authors=[ba.author for ba in book.book_authors],
-        description=book.description,
-        quantity=book.quantity,
-        created_at=book.created_at,
-        updated_at=book.updated_at,
-        category_id=book.category_id,
-        category=book.category.name if book.category else None
-    )
-    return book_response
+    return BookResponse.model_validate(await _load_book(db, book.id))
 
 
 # Delete a book
 @router.delete("/delete/{book_id}", status_code=200)
-def delete_book(book_id: int, db: Session = Depends(get_db), 
-                current_user:  User = Depends(dependencies.require_admin)):
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
+async def delete_book(book_id: int, db: AsyncSession = Depends(get_async_db), 
+                      current_user: Principal = Depends(dependencies.require_admin)):
+    book = await db.get(models.Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
-    db.delete(book)
-    db.commit()
-    print(f"Book with ID {book_id} deleted successfully.")
-    return {"detail": "Book deleted successfully"}
\ No newline at end of file
+    await db.delete(book)
+    await db.commit()
+    logger.info("Book deleted", extra={"book_id": book_id})
+    return {"detail": "Book deleted successfully"}
+
+
+# Update many books in one transaction.
+# Cập nhật bằng ORM bulk UPDATE theo khóa chính (executemany, gom theo tập cột) thay vì nạp và commit từng sách;
+# tác giả phụ chỉ thay đổi phần chênh lệch, cho cả lô
+@router.put("/batch/update", response_model=BatchResult)
+async def update_books(patches: list[BookBatchUpdate] = Body(..., min_length=1, max_length=settings.ADMIN_BATCH_MAX_SIZE),
+                       db: AsyncSession = Depends(get_async_db),
+                       current_user: Principal = Depends(dependencies.require_admin)):
+    ids = [patch.id for patch in patches]
+    reject_duplicates(ids, "book")
+    require_all_found(ids, await existing_ids_async(db, Book.id, ids), "Books")
+
+    category_ids = unique_ids(patch.category_id for patch in patches if patch.category_id is not None)
+    if category_ids:
+        require_all_found(category_ids, await existing_ids_async(db, models.Category.id, category_ids), "Categories")
+    author_ids = unique_ids([patch.main_author_id for patch in patches if patch.main_author_id is not None]
+                            + [author_id for patch in patches for author_id in patch.book_authors or []])
+    if author_ids:
+        require_all_found(author_ids, await existing_ids_async(db, models.Author.id, author_ids), "Authors")
+
+    now = datetime.now(timezone.utc)
+    rows = [{**patch.model_dump(exclude_unset=True, exclude={"book_authors"}), "updated_at": now} for patch in patches]
+    await db.execute(update(Book), rows)
+
+    changed = await _sync_book_authors(db, {patch.id: set(patch.book_authors) for patch in patches
+                                            if patch.book_authors is not None})
+
+    # Bulk UPDATE không qua event after_flush của ORM: tự cập nhật chỉ mục tìm kiếm
+    reindex = changed | {patch.id for patch in patches if patch.model_fields_set & set(INDEXED_BOOK_FIELDS)}
+    if reindex:
+        await db.run_sync(lambda session: refresh_book_documents(session.connection(), reindex))
+    await db.commit()
+    return {"detail": "Books updated successfully", "count": len(ids)}
+
+
+# Delete many books in one transaction
+@router.post("/batch/delete", response_model=BatchResult)
+async def delete_books(batch: BatchDelete, db: AsyncSession = Depends(get_async_db),
+                       current_user: Principal = Depends(dependencies.require_admin)):
+    ids = unique_ids(batch.ids)
+    require_all_found(ids, await existing_ids_async(db, Book.id, ids), "Books")
+    borrowed = await existing_ids_async(db, models.Borrow.book_id, ids)
+    if borrowed:
+        raise conflict("Books with borrow records cannot be deleted", borrowed)
+
+    await db.execute(delete(models.BookAuthor).where(models.BookAuthor.book_id.in_(ids)),
+                     execution_options={"synchronize_session": False})
+    await db.run_sync(lambda session: remove_book_documents(session.connection(), ids))
+    await db.execute(delete(Book).where(Book.id.in_(ids)), execution_options={"synchronize_session": False})
+    await db.commit()
+    return {"detail": "Books deleted successfully", "count": len(ids)}
+
+
+# Import books from a CSV or NDJSON file.
+# Hàm sync (chạy trong threadpool): file upload đã được Starlette ghi tạm ra đĩa, ở đây đọc và
+# phân tích từng dòng, nhập theo lô trong một transaction; dòng lỗi được báo lại theo số dòng
+@router.post("/import", response_model=BookImportResult)
+def import_books(file: UploadFile = File(..., description="CSV with a header row, or one JSON object per line"),
+                 format: Literal["csv", "ndjson"] = Query(None, description="Defaults to the file extension"),
+                 create_authors: bool = Query(True, description="Create authors that do not exist yet"),
+                 db: Session = Depends(get_db),
+                 current_user: Principal = Depends(dependencies.require_admin)):
+    fmt = format or book_io.detect_format(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Unknown file format, use format=csv or format=ndjson")
+
+    lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return book_io.import_books(db, book_io.read_rows(lines, fmt), create_authors)
+    except UnicodeDecodeError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    finally:
+        lines.detach()
+
+
+# Export the whole catalog as CSV or NDJSON, streamed in chunks
+@router.get("/export")
+def export_books(format: Literal["csv", "ndjson"] = Query("csv"),
+                 current_user: Principal = Depends(dependencies.require_admin)):
+    return StreamingResponse(book_io.stream_export(format), media_type=book_io.MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="books.{format}"'})
\ No newline at end of file
@@ -1,27 +1,38 @@
+import logging
 from datetime import datetime, timezone
 from typing import Literal
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
 from fastapi_pagination import Page, add_pagination, paginate
-from sqlalchemy import func
+from sqlalchemy import delete, func, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app import dependencies, models
+from app.config import settings
 from app.dependencies import get_db
 from app.models.category import Category
-from app.models.user import User
-from app.schemas.category import CategoryCreate, CategoryResponse, CategoryUpdate
+from app.auth.principal import Principal
+from app.schemas.batch import BatchDelete, BatchResult
+from app.utils.catalog_cache import cached_catalog_response, catalog_cache_key, catalog_response
+from app.schemas.category import CategoryBatchUpdate, CategoryCreate, CategoryResponse, CategoryUpdate
+from app.utils.batch import existing_ids, reject_duplicates, require_all_found, unique_ids
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 add_pagination(router)
 
 # Get all categories
 @router.get("/", response_model=Page[CategoryResponse])
-def get_categories(name: str = Query(None, description="Search categories by name"),
+def get_categories(request: Request,
+                   name: str = Query(None, description="Search categories by name"),
                    db: Session = Depends(get_db),
-                   current_user: User = Depends(dependencies.require_admin),
+                   current_user: Principal = Depends(dependencies.require_admin),
                    order_by: Literal["id", "name"] = Query("id"),
                    sort: Literal["asc", "desc"] = Query("asc")):
+    key = catalog_cache_key(request)
+    if (cached := cached_catalog_response(request, key)) is not None:
+        return cached
     column = {
         "id": models.Category.id,
         "name": models.Category.name
@@ -34,11 +45,6 @@ def get_categories(name: str = Query(None, description="Search categories by nam
     elif sort == "asc":
         order_column = order_column.asc()
     
-    categories = db.query(models.Category).order_by(order_column).all()
-
-    if not categories:
-        raise HTTPException(status_code=404, detail="No categories found")
-    
     query = db.query(
         models.Category.id,
         models.Category.name,
@@ -53,18 +59,20 @@ def get_categories(name: str = Query(None, description="Search categories by nam
     if name:
         query = query.filter(models.Category.name.ilike(f"%{name}%"))
 
-    print(query)
     results = query.all()
     if not results:
+        # Chỉ kiểm tra bảng rỗng khi không có kết quả, thay vì nạp mọi thể loại ở mỗi request
+        if db.query(models.Category.id).first() is None:
+            raise HTTPException(status_code=404, detail="No categories found")
         raise HTTPException(status_code=404, detail="No matching categories found")
-    return paginate(results)
+    return catalog_response(request, key, paginate(results), db)
 
 
 # Create a new category
 @router.post("/add", response_model=CategoryResponse)
 
 def create_category(category: CategoryCreate, db: Session = Depends(get_db),
-                    current_user: User = Depends(dependencies.require_admin)):
+                    current_user: Principal = Depends(dependencies.require_admin)):
     new_category = Category(
         name=category.name,
         description=category.description,
@@ -74,22 +82,14 @@ def create_category(category: CategoryCreate, db: Session = Depends(get_db),
     db.add(new_category)
     db.commit()
     db.refresh(new_category)
-
-    category_response = CategoryResponse(
-        id=new_category.id,
-        name=new_category.name,
-        description=new_category.description,
-        created_at=datetime.now(timezone.utc),
-        updated_at=datetime.now(timezone.utc),
-        book_count=db.query(func.count(models.Book.id)).filter(models.Book.category_id == new_category.id).scalar()
-    )
-    return category_response
+    # Thể loại mới chưa có sách: book_count mặc định 0
+    return CategoryResponse.model_validate(new_category)
 
 
 # Update category details
 @router.put("/update/{category_id}", response_model=CategoryResponse)
 def update_category(category_id: int, category: CategoryUpdate, db: Session = Depends(get_db),
-                    current_user: User = Depends(dependencies.require_admin)):
+                    current_user: Principal = Depends(dependencies.require_admin)):
     db_category = db.query(models.Category).filter(models.Category.id == category_id).first()
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
@@ -99,27 +99,55 @@ def update_category(category_id: int, category: CategoryUpdate, db: Session = De
     db_category.updated_at = datetime.now(timezone.utc)
     db.commit()
     db.refresh(db_category)
-    
-    category_response = CategoryResponse(
-        id=db_category.id,
-        name=db_category.name,
-        description=db_category.description,
-        created_at=db_category.created_at,
-        updated_at=db_category.updated_at,
-        book_count=db.query(func.count(models.Book.id)).filter(models.Book.category_id == db_category.id).scalar()
-    )
+
+    category_response = CategoryResponse.model_validate(db_category)
+    category_response.book_count = db.query(func.count(models.Book.id))\
+        .filter(models.Book.category_id == db_category.id).scalar()
     return category_response
 
 
 # Delete a category
 @router.delete("/delete/{category_id}", status_code=200)
 def delete_category(category_id: int, db: Session = Depends(get_db),
-                    current_user: User = Depends(dependencies.require_admin)):
+                    current_user: Principal = Depends(dependencies.require_admin)):
     db_category = db.query(models.Category).filter(models.Category.id == category_id).first()
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
 
     db.delete(db_category)
     db.commit()
-    print(f"Category with ID {category_id} deleted successfully.")
-    return {"detail": "Category deleted successfully"}
\ No newline at end of file
+    logger.info("Category deleted", extra={"category_id": category_id})
+    return {"detail": "Category deleted successfully"}
+
+
+# Update many categories in one transaction
+@router.put("/batch/update", response_model=BatchResult)
+def update_categories(patches: list[CategoryBatchUpdate] = Body(..., min_length=1, max_length=settings.ADMIN_BATCH_MAX_SIZE),
+                      db: Session = Depends(get_db),
+                      current_user: Principal = Depends(dependencies.require_admin)):
+    ids = [patch.id for patch in patches]
+    reject_duplicates(ids, "category")
+    require_all_found(ids, existing_ids(db, Category.id, ids), "Categories")
+
+    now = datetime.now(timezone.utc)
+    try:
+        db.execute(update(Category), [{**patch.model_dump(exclude_unset=True), "updated_at": now} for patch in patches])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Category name already exists")
+    return {"detail": "Categories updated successfully", "count": len(ids)}
+
+
+# Delete many categories in one transaction; sách thuộc các thể loại này giữ lại với category_id = NULL
+@router.post("/batch/delete", response_model=BatchResult)
+def delete_categories(batch: BatchDelete, db: Session = Depends(get_db),
+                      current_user: Principal = Depends(dependencies.require_admin)):
+    ids = unique_ids(batch.ids)
+    require_all_found(ids, existing_ids(db, Category.id, ids), "Categories")
+
+    db.execute(update(models.Book).where(models.Book.category_id.in_(ids)).values(category_id=None),
+               execution_options={"synchronize_session": False})
+    db.execute(delete(Category).where(Category.id.in_(ids)), execution_options={"synchronize_session": False})
+    db.commit()
+    return {"detail": "Categories deleted successfully", "count": len(ids)}
\ No newline at end of file
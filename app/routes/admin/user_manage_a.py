@@ -1,20 +1,25 @@
+import logging
 from typing import Literal
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi_pagination import Page, add_pagination, paginate
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
 
 from app import dependencies, models, schemas
-from app.models.user import User
+from app.auth.principal import Principal, invalidate_principal
 from app.dependencies import get_db
+from app.schemas.pagination import CursorPage
+from app.utils.pagination import CURSOR_DEFAULT_SIZE, CURSOR_MAX_SIZE, keyset_paginate
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 add_pagination(router)
 
 # Get all users
 @router.get("/", response_model=Page[schemas.UserResponse])
 def get_users(db: Session = Depends(get_db),
-                  current_user: User = Depends(dependencies.require_admin),
+                  current_user: Principal = Depends(dependencies.require_admin),
                   order_by: Literal["id", "username", "email"] = Query("id"),
                   sort: Literal["asc", "desc"] = Query("asc")):
     column = {
@@ -37,15 +42,35 @@ def get_users(db: Session = Depends(get_db),
     return paginate(users)
 
 
+# Get users with keyset (cursor) pagination
+@router.get("/cursor", response_model=CursorPage[schemas.UserResponse])
+def get_users_cursor(db: Session = Depends(get_db),
+                     current_user: Principal = Depends(dependencies.require_admin),
+                     order_by: Literal["id", "username", "email"] = Query("id"),
+                     sort: Literal["asc", "desc"] = Query("asc"),
+                     cursor: str = Query(None, description="next_cursor of the previous page"),
+                     size: int = Query(CURSOR_DEFAULT_SIZE, ge=1, le=CURSOR_MAX_SIZE)):
+    column = {
+        "id": models.User.id,
+        "username": models.User.username,
+        "email": models.User.email
+    }
+
+    query = select(models.User).options(joinedload(models.User.role))
+    return keyset_paginate(db, query, column[order_by], models.User.id,
+                           order_by, sort, cursor, size)
+
+
 # Delete user by ID
 @router.delete("/{user_id}", status_code=200)
 def delete_user(user_id: int, db: Session = Depends(get_db), 
-                current_user: User = Depends(dependencies.require_admin)):
+                current_user: Principal = Depends(dependencies.require_admin)):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     db.delete(user)
     db.commit()
-    print(f"User with ID {user_id} deleted successfully.")
+    invalidate_principal(user_id)
+    logger.info("User deleted", extra={"user_id": user_id})
     return {"detail": "User deleted successfully"}
\ No newline at end of file
@@ -2,11 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 import httpx
 
-from app.dependencies import get_current_user, get_db
+from app.auth.http_client import get_keycloak_client
+from app.dependencies import get_current_user
 from app.models.user import User
 from app.schemas.user import UserResponse
 from app.schemas.token import Token
 from app.config import settings
+from app.utils.metrics import LOGINS
 
 router = APIRouter()
 
@@ -14,62 +16,67 @@ router = APIRouter()
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):    
     # Gọi API Keycloak để lấy token
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{settings.KEYCLOAK_URL}/realms/{settings.KEYCLOAK_REALM}/protocol/openid-connect/token",
-                data={
-                    "grant_type": "password",
-                    "client_id": settings.KEYCLOAK_CLIENT_ID,
-                    "client_secret": settings.KEYCLOAK_CLIENT_SECRET,
-                    "username": form_data.username,
-                    "password": form_data.password,
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-            )
-            response.raise_for_status()
-            tokens = response.json()
+    client = get_keycloak_client()
+    try:
+        response = await client.post(
+            "/token",
+            data={
+                "grant_type": "password",
+                "client_id": settings.KEYCLOAK_CLIENT_ID,
+                "client_secret": settings.KEYCLOAK_CLIENT_SECRET,
+                "username": form_data.username,
+                "password": form_data.password,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        response.raise_for_status()
+        tokens = response.json()
+        LOGINS.labels("success").inc()
 
-            return {
-                "access_token": tokens["access_token"],
-                "refresh_token": tokens.get("refresh_token", ""),
-                "token_type": tokens["token_type"],
-            }
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=f"Keycloak authentication failed: {e.response.text}",
-            )
+        return {
+            "access_token": tokens["access_token"],
+            "refresh_token": tokens.get("refresh_token", ""),
+            "token_type": tokens["token_type"],
+        }
+    except httpx.HTTPStatusError as e:
+        LOGINS.labels("rejected").inc()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Keycloak authentication failed: {e.response.text}",
+        )
+    except httpx.HTTPError:
+        LOGINS.labels("error").inc()  # Không kết nối được Keycloak
+        raise
 
 
 @router.post("/token/refresh", response_model=Token)
 async def refresh_access_token(refresh_token: str):
     # Gọi API Keycloak để làm mới token
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{settings.KEYCLOAK_URL}/realms/{settings.KEYCLOAK_REALM}/protocol/openid-connect/token",
-                data={
-                    "grant_type": "refresh_token",
-                    "client_id": settings.KEYCLOAK_CLIENT_ID,
-                    "client_secret": settings.KEYCLOAK_CLIENT_SECRET,
-                    "refresh_token": refresh_token,
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-            )
-            response.raise_for_status()
-            tokens = response.json()
+    client = get_keycloak_client()
+    try:
+        response = await client.post(
+            "/token",
+            data={
+                "grant_type": "refresh_token",
+                "client_id": settings.KEYCLOAK_CLIENT_ID,
+                "client_secret": settings.KEYCLOAK_CLIENT_SECRET,
+                "refresh_token": refresh_token,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        response.raise_for_status()
+        tokens = response.json()
 
-            return {
-                "access_token": tokens["access_token"],
-                "refresh_token": tokens.get("refresh_token", ""),
-                "token_type": tokens["token_type"],
-            }
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=f"Keycloak token refresh failed: {e.response.text}",
-            )
+        return {
+            "access_token": tokens["access_token"],
+            "refresh_token": tokens.get("refresh_token", ""),
+            "token_type": tokens["token_type"],
+        }
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Keycloak token refresh failed: {e.response.text}",
+        )
 
 
 # Endpoint để lấy thông tin người dùng hiện tại
@@ -81,21 +88,21 @@ def read_users_me(current_user: User = Depends(get_current_user)):
 # Endpoint để đăng xuất (logout)
 @router.post("/logout")
 async def logout_user(refresh_token: str):
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{settings.KEYCLOAK_URL}/realms/{settings.KEYCLOAK_REALM}/protocol/openid-connect/logout",
-                data={
-                    "client_id": settings.KEYCLOAK_CLIENT_ID,
-                    "client_secret": settings.KEYCLOAK_CLIENT_SECRET,
-                    "refresh_token": refresh_token,
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-            )
-            response.raise_for_status()
-            return {"detail": "Successfully logged out"}
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Keycloak logout failed: {e.response.text}",
-            )
\ No newline at end of file
+    client = get_keycloak_client()
+    try:
+        response = await client.post(
+            "/logout",
+            data={
+                "client_id": settings.KEYCLOAK_CLIENT_ID,
+                "client_secret": settings.KEYCLOAK_CLIENT_SECRET,
+                "refresh_token": refresh_token,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        response.raise_for_status()
+        return {"detail": "Successfully logged out"}
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Keycloak logout failed: {e.response.text}",
+        )
\ No newline at end of file
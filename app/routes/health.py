@@ -0,0 +1,43 @@
+import logging
+import time
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+
+from app.database import async_engine, async_replica_engine, engine, replica_engine
+from app.utils.db_metrics import pool_status
+from app.utils.hashing import hashing_stats
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Độ sâu hàng đợi và số việc đang chạy của thread pool bcrypt
+@router.get("/hashing")
+def get_hashing_health():
+    return hashing_stats()
+
+
+# Kiểm tra DB bằng SELECT 1 và trả trạng thái + số liệu của hai connection pool
+@router.get("/db")
+async def get_db_health():
+    start = time.perf_counter()
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        database = {"status": "ok", "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+    except Exception:
+        # Endpoint không cần đăng nhập: chi tiết lỗi của driver (host, port, câu SQL) chỉ ghi vào log
+        logger.exception("Database health check failed")
+        database = {"status": "error", "error": "unavailable"}
+
+    body = {
+        "database": database,
+        "pools": {
+            "sync": pool_status(engine),
+            "async": pool_status(async_engine.sync_engine),
+        },
+    }
+    if replica_engine is not engine:
+        body["pools"]["replica_sync"] = pool_status(replica_engine)
+        body["pools"]["replica_async"] = pool_status(async_replica_engine.sync_engine)
+    return JSONResponse(body, status_code=200 if database["status"] == "ok" else 503)
\ No newline at end of file
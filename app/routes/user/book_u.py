@@ -1,14 +1,17 @@
-from datetime import datetime, timezone
 from typing import Literal
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi_pagination import Page, add_pagination, paginate
-from sqlalchemy import or_
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi_pagination import Page, add_pagination
+from fastapi_pagination.ext.sqlalchemy import apaginate
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import dependencies, models
-from app.dependencies import get_db
-from app.models.user import User
+from app.dependencies import get_async_read_db
+from app.auth.principal import Principal
 from app.schemas.book import BookResponse
+from app.schemas.pagination import CursorPage
+from app.utils.catalog_cache import cached_catalog_response, catalog_cache_key, catalog_response
+from app.utils.book_query import BOOK_ORDER_COLUMNS, build_book_query, books_to_response
+from app.utils.pagination import CURSOR_DEFAULT_SIZE, CURSOR_MAX_SIZE, keyset_paginate_async
 
 router = APIRouter()
 
@@ -16,66 +19,44 @@ add_pagination(router)
 
 # Get all books
 @router.get("/", response_model=Page[BookResponse])
-def get_books(title: str = Query(None, description="Search books by title"),
-              author: str = Query(None, description="Search books by author"),
-              category: str = Query(None, description="Search books by category"),
-              db: Session = Depends(get_db), 
-              current_user: User = Depends(dependencies.require_user),
-              order_by: Literal["id", "title"] = Query("id"),
-              sort: Literal["asc", "desc"] = Query("asc")):
-    column = {
-        "id": models.Book.id,
-        "title": models.Book.title
-    }
+async def get_books(request: Request,
+                    q: str = Query(None, description="Full-text search over title, description and authors"),
+                    title: str = Query(None, description="Search books by title"),
+                    author: str = Query(None, description="Search books by author"),
+                    category: str = Query(None, description="Search books by category"),
+                    db: AsyncSession = Depends(get_async_read_db), 
+                    current_user: Principal = Depends(dependencies.require_user),
+                    order_by: Literal["relevance", "id", "title"] = Query(None, description="Defaults to relevance when q is set, id otherwise"),
+                    sort: Literal["asc", "desc"] = Query("asc")):
+    key = catalog_cache_key(request)
+    if (cached := cached_catalog_response(request, key)) is not None:
+        return cached
+    query = build_book_query(title, author, category, order_by, sort,
+                             q=q, dialect=db.get_bind().dialect.name)
 
-    order_column = column.get(order_by, models.Book.id)
-
-    if sort == "desc":
-        order_column = order_column.desc()
-    elif sort == "asc":
-        order_column = order_column.asc()
-
-    query = db.query(models.Book)\
-            .options(joinedload(models.Book.main_author),
-                     joinedload(models.Book.book_authors).joinedload(models.BookAuthor.author),
-                     joinedload(models.Book.category)
-                     )\
-            .group_by(models.Book.id)\
-            .order_by(order_column)
-    
-    if title:
-        query = query.filter(models.Book.title.ilike(f"%{title}%"))
-    if author:
-        subquery = db.query(models.BookAuthor.book_id)\
-                    .join(models.Author)\
-                    .filter(models.Author.name.ilike(f"%{author}%"))\
-                    .subquery()
-        query = query.outerjoin(models.Book.main_author)\
-                    .filter(
-                        or_(
-                            models.Author.name.ilike(f"%{author}%"),
-                            models.Book.id.in_(subquery)
-                        )
-                    )
-    if category:
-        query = query.filter(models.Book.category.has(models.Category.name.ilike(f"%{category}%")))
-    
-    books = query.all()
-    if not books:
+    # LIMIT/OFFSET + COUNT chạy trong SQL, chỉ các sách của trang hiện tại được nạp
+    page = await apaginate(db, query, transformer=books_to_response)
+    if not page.total:
         raise HTTPException(status_code=404, detail="No books found")
-    
-    book_response = []
-    for book in books:
-        book_response.append(BookResponse(
-            id=book.id,
-            title=book.title,
-            main_author=book.main_author,
-            authors=[ba.author for ba in book.book_authors],
-            description=book.description,
-            quantity=book.quantity,
-            created_at=datetime.now(timezone.utc),
-            updated_at=datetime.now(timezone.utc),
-            category_id=book.category_id,
-            category=book.category.name if book.category else None
-        ))
-    return paginate(book_response)
\ No newline at end of file
+    return catalog_response(request, key, page, db)
+
+# Get books with keyset (cursor) pagination
+@router.get("/cursor", response_model=CursorPage[BookResponse])
+async def get_books_cursor(request: Request,
+                           q: str = Query(None, description="Full-text search over title, description and authors"),
+                           title: str = Query(None, description="Search books by title"),
+                           author: str = Query(None, description="Search books by author"),
+                           category: str = Query(None, description="Search books by category"),
+                           db: AsyncSession = Depends(get_async_read_db),
+                           current_user: Principal = Depends(dependencies.require_user),
+                           order_by: Literal["id", "title"] = Query("id"),
+                           sort: Literal["asc", "desc"] = Query("asc"),
+                           cursor: str = Query(None, description="next_cursor of the previous page"),
+                           size: int = Query(CURSOR_DEFAULT_SIZE, ge=1, le=CURSOR_MAX_SIZE)):
+    key = catalog_cache_key(request)
+    if (cached := cached_catalog_response(request, key)) is not None:
+        return cached
+    query = build_book_query(title, author, category, q=q, dialect=db.get_bind().dialect.name)
+    page = await keyset_paginate_async(db, query, BOOK_ORDER_COLUMNS[order_by], models.Book.id,
+                                       order_by, sort, cursor, size, transformer=books_to_response)
+    return catalog_response(request, key, page, db)
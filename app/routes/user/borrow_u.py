@@ -1,72 +1,164 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 
 from app import dependencies, models, schemas
-from app.models.user import User
+from app.auth.principal import Principal
+from app.models.borrow import ACTIVE_BORROW_STATUSES, BorrowStatus
+from app.schemas.pagination import CursorPage
+from app.utils.book_query import book_load_options
+from app.utils.metrics import BORROW_OPERATIONS
+from app.utils.pagination import CURSOR_DEFAULT_SIZE, CURSOR_MAX_SIZE, keyset_paginate_async
 
 router = APIRouter()
 
+# Lượt mượn kèm sách và các quan hệ của sách
+def _borrow_query():
+    return select(models.Borrow).options(joinedload(models.Borrow.book).options(*book_load_options()))
+
+# Các câu truy vấn theo user dưới đây dựa vào index (user_id, status, borrow_date) và (user_id, book_id, status)
+def current_borrows_query(user_id: int):
+    return _borrow_query().where(
+        models.Borrow.user_id == user_id,
+        models.Borrow.status.in_(ACTIVE_BORROW_STATUSES)
+    )
+
+def borrow_history_query(user_id: int):
+    return _borrow_query().where(
+        models.Borrow.user_id == user_id,
+        models.Borrow.status == BorrowStatus.returned
+    )
+
+def active_borrow_query(user_id: int, book_id: int):
+    return select(models.Borrow.id).where(
+        models.Borrow.user_id == user_id,
+        models.Borrow.book_id == book_id,
+        models.Borrow.status.in_(ACTIVE_BORROW_STATUSES)
+    ).limit(1)
+
 # Endpoint để lấy danh sách sách đang mượn
 @router.get("/current", response_model=list[schemas.BorrowResponse])
-def get_current_borrows(
-    db: Session = Depends(dependencies.get_db),
-    current_user: User = Depends(dependencies.require_user)
+async def get_current_borrows(
+    db: AsyncSession = Depends(dependencies.get_async_read_db),
+    current_user: Principal = Depends(dependencies.require_user)
 ):
-    borrows = db.query(models.Borrow).options(joinedload(models.Borrow.book)).filter(
-        models.Borrow.user_id == current_user.id,
-        models.Borrow.status == 'borrowing'
-    ).all()
-    return borrows
+    borrows = await db.scalars(current_borrows_query(current_user.id))
+    return borrows.unique().all()
 
 # Endpoint để lấy lịch sử mượn sách
 @router.get("/history", response_model=list[schemas.BorrowResponse])
-def get_borrow_history(
-    db: Session = Depends(dependencies.get_db),
-    current_user: User = Depends(dependencies.require_user)
+async def get_borrow_history(
+    db: AsyncSession = Depends(dependencies.get_async_read_db),
+    current_user: Principal = Depends(dependencies.require_user)
 ):
-    borrows = db.query(models.Borrow).options(joinedload(models.Borrow.book)).filter(
-        models.Borrow.user_id == current_user.id,
-        models.Borrow.status != 'borrowing'
-    ).order_by(models.Borrow.borrow_date.desc()).all()
-    return borrows
+    borrows = await db.scalars(borrow_history_query(current_user.id)
+                               .order_by(models.Borrow.borrow_date.desc()))
+    return borrows.unique().all()
+
+# Endpoint để lấy lịch sử mượn sách theo cursor (keyset) để duyệt hết lịch sử an toàn
+@router.get("/history/cursor", response_model=CursorPage[schemas.BorrowResponse])
+async def get_borrow_history_cursor(
+    db: AsyncSession = Depends(dependencies.get_async_read_db),
+    current_user: Principal = Depends(dependencies.require_user),
+    sort: Literal["asc", "desc"] = Query("desc"),
+    cursor: str = Query(None, description="next_cursor of the previous page"),
+    size: int = Query(CURSOR_DEFAULT_SIZE, ge=1, le=CURSOR_MAX_SIZE)
+):
+    return await keyset_paginate_async(db, borrow_history_query(current_user.id),
+                                       models.Borrow.borrow_date, models.Borrow.id,
+                                       "borrow_date", sort, cursor, size)
+
 
 # Endpoint để người dùng mượn một cuốn sách
 @router.post("/borrow/{book_id}", response_model=schemas.BorrowResponse)
-def borrow_book(
+async def borrow_book(
     book_id: int,
-    db: Session = Depends(dependencies.get_db),
-    current_user: User = Depends(dependencies.require_user)
+    db: AsyncSession = Depends(dependencies.get_async_db),
+    current_user: Principal = Depends(dependencies.require_user)
 ):
-    # 1. Kiểm tra sách có tồn tại và còn sách không
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
-    if not book:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
-    if book.quantity <= 0:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Book is out of stock")
-
-    # 2. Kiểm tra người dùng đã mượn cuốn này chưa
-    existing_borrow = db.query(models.Borrow).filter(
-        models.Borrow.user_id == current_user.id,
-        models.Borrow.book_id == book_id,
-        models.Borrow.status == 'borrowing'
-    ).first()
+    # 1. Kiểm tra nhanh người dùng đã mượn cuốn này chưa (unique constraint ở bước 3 mới là chốt chặn thật)
+    existing_borrow = await db.scalar(active_borrow_query(current_user.id, book_id))
     if existing_borrow:
+        BORROW_OPERATIONS.labels("borrow", "duplicate").inc()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You have already borrowed this book")
 
-    # 3. Tạo lượt mượn mới
+    # 2. Giảm số lượng bằng một câu UPDATE có điều kiện: hai request tranh cuốn cuối cùng
+    # thì chỉ một câu khớp được dòng, không bao giờ xuống số âm
+    result = await db.execute(
+        update(models.Book)
+        .where(models.Book.id == book_id, models.Book.quantity > 0)
+        .values(quantity=models.Book.quantity - 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        if await db.get(models.Book, book_id) is None:
+            BORROW_OPERATIONS.labels("borrow", "not_found").inc()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
+        BORROW_OPERATIONS.labels("borrow", "out_of_stock").inc()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Book is out of stock")
+
+    # 3. Tạo lượt mượn mới trong cùng transaction
     new_borrow = models.Borrow(
         user_id=current_user.id,
         book_id=book_id,
         borrow_date=datetime.utcnow(),
-        due_date=datetime.utcnow() + timedelta(days=14) # Hạn trả sách là 14 ngày
+        due_date=datetime.utcnow() + timedelta(days=14), # Hạn trả sách là 14 ngày
+        active=True
     )
-    
-    # 4. Giảm số lượng sách
-    book.quantity -= 1
-
     db.add(new_borrow)
-    db.commit()
-    db.refresh(new_borrow)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Request song song của cùng user đã mượn trước: rollback trả lại số lượng vừa trừ
+        await db.rollback()
+        BORROW_OPERATIONS.labels("borrow", "duplicate").inc()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You have already borrowed this book")
+    BORROW_OPERATIONS.labels("borrow", "success").inc()
     
-    return new_borrow
\ No newline at end of file
+    return await db.scalar(_borrow_query().where(models.Borrow.id == new_borrow.id)
+                           .execution_options(populate_existing=True))
+
+
+# Endpoint để người dùng trả sách
+@router.post("/return/{borrow_id}", response_model=schemas.BorrowResponse)
+async def return_book(
+    borrow_id: int,
+    db: AsyncSession = Depends(dependencies.get_async_db),
+    current_user: Principal = Depends(dependencies.require_user)
+):
+    borrow = await db.scalar(select(models.Borrow).where(
+        models.Borrow.id == borrow_id,
+        models.Borrow.user_id == current_user.id
+    ))
+    if not borrow:
+        BORROW_OPERATIONS.labels("return", "not_found").inc()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Borrow not found")
+
+    # Chuyển trạng thái có điều kiện: hai lần trả đồng thời thì chỉ một lần khớp dòng và cộng lại sách
+    result = await db.execute(
+        update(models.Borrow)
+        .where(models.Borrow.id == borrow_id, models.Borrow.status.in_(ACTIVE_BORROW_STATUSES))
+        .values(status=BorrowStatus.returned, return_date=datetime.utcnow(), active=None)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        BORROW_OPERATIONS.labels("return", "already_returned").inc()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Book has already been returned")
+
+    await db.execute(
+        update(models.Book)
+        .where(models.Book.id == borrow.book_id)
+        .values(quantity=models.Book.quantity + 1)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    BORROW_OPERATIONS.labels("return", "success").inc()
+
+    return await db.scalar(_borrow_query().where(models.Borrow.id == borrow_id)
+                           .execution_options(populate_existing=True))
\ No newline at end of file
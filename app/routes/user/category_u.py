@@ -1,11 +1,12 @@
 from typing import Literal
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi_pagination import Page, add_pagination, paginate
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app import dependencies, models
-from app.models.user import User
+from app.auth.principal import Principal
+from app.utils.catalog_cache import cached_catalog_response, catalog_cache_key, catalog_response
 from app.schemas.category import CategoryResponse
 
 
@@ -14,11 +15,15 @@ router = APIRouter()
 add_pagination(router)
 
 @router.get("/", response_model=Page[CategoryResponse])
-def get_categories(name: str = Query(None, description="Search categories by name"),
-                   db: Session = Depends(dependencies.get_db),
-                   current_user: User = Depends(dependencies.require_user),
+def get_categories(request: Request,
+                   name: str = Query(None, description="Search categories by name"),
+                   db: Session = Depends(dependencies.get_read_db),
+                   current_user: Principal = Depends(dependencies.require_user),
                    order_by: Literal["id", "name"] = Query("id"),
                    sort: Literal["asc", "desc"] = Query("asc")):
+    key = catalog_cache_key(request)
+    if (cached := cached_catalog_response(request, key)) is not None:
+        return cached
     column = {
         "id": models.Category.id,
         "name": models.Category.name
@@ -31,14 +36,6 @@ def get_categories(name: str = Query(None, description="Search categories by nam
     elif sort == "asc":
         order_column = order_column.asc()
     
-    categories = db.query(models.Category).order_by(order_column).all()
-
-    if not categories:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, 
-            detail="No categories found"
-        )
-
     query = db.query(
         models.Category.id,
         models.Category.name,
@@ -55,9 +52,15 @@ def get_categories(name: str = Query(None, description="Search categories by nam
 
     results = query.all()
     if not results:
+        # Chỉ kiểm tra bảng rỗng khi không có kết quả, thay vì nạp mọi thể loại ở mỗi request
+        if db.query(models.Category.id).first() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No categories found"
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No matching categories found"
         )
 
-    return paginate(results)
\ No newline at end of file
+    return catalog_response(request, key, paginate(results), db)
\ No newline at end of file
@@ -1,27 +1,27 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import dependencies, schemas
 from app.auth import auth_service
 from app.models.user import User
-from app.dependencies import get_db
+from app.dependencies import get_async_db
 
 router = APIRouter()
 
 # Register user
 @router.post("/register", response_model=schemas.UserResponse)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    return auth_service.register_user(user, db)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    return await auth_service.register_user(user, db)
 
 
 # Login user
 @router.post("/login", response_model=schemas.Token)
-async def login_user(email: str, password: str, db: Session = Depends(get_db)):
+async def login_user(email: str, password: str, db: AsyncSession = Depends(get_async_db)):
     return await auth_service.login_user(email, password, db)
 
 
 # Update user details
 @router.put("/update", response_model=schemas.UserResponse)
-def update_user(user_update: schemas.UserUpdate, db: Session = Depends(get_db),
-                current_user: User = Depends(dependencies.get_current_user)):
-    return auth_service.update_user(user_update, db, current_user)
\ No newline at end of file
+async def update_user(user_update: schemas.UserUpdate, db: AsyncSession = Depends(get_async_db),
+                      current_user: User = Depends(dependencies.get_current_user)):
+    return await auth_service.update_user(user_update, db, current_user)
\ No newline at end of file
@@ -8,6 +8,9 @@ class AuthorCreate(BaseModel):
 class AuthorUpdate(BaseModel):
     name: Optional[str] = None
 
+class AuthorBatchUpdate(AuthorUpdate):
+    id: int
+
 class AuthorResponse(BaseModel):
     id: int
     name: str
@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+
+from app.config import settings
+
+class BatchDelete(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=settings.ADMIN_BATCH_MAX_SIZE)
+
+class BatchResult(BaseModel):
+    detail: str
+    count: int
\ No newline at end of file
@@ -1,5 +1,5 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import AliasChoices, BaseModel, Field
 from typing import Optional
 
 from app.schemas.author import AuthorResponse
@@ -21,6 +21,9 @@ class BookUpdate(BaseModel):
     category_id: Optional[int] = None
     book_authors: Optional[list[int]] = None
 
+class BookBatchUpdate(BookUpdate):
+    id: int
+
 class BookResponse(BaseModel):
     id: int
     title: str
@@ -31,7 +34,26 @@ class BookResponse(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     category_id: int
-    category: Optional[str] = None
+    # Tên thể loại: đọc từ Book.category_name khi validate từ ORM
+    category: Optional[str] = Field(None, validation_alias=AliasChoices("category_name", "category"))
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Một dòng của file nhập sách (CSV/NDJSON): tác giả và thể loại ghi bằng tên
+class BookImportRow(BaseModel):
+    title: str = Field(min_length=1, max_length=100)
+    main_author: str = Field(min_length=1, max_length=100)
+    authors: list[str] = []
+    description: Optional[str] = Field(None, max_length=500)
+    quantity: int = Field(0, ge=0)
+    category: str = Field(min_length=1)
+
+class BookImportError(BaseModel):
+    line: int
+    error: str
+
+class BookImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: list[BookImportError] = []
\ No newline at end of file
@@ -2,6 +2,7 @@ from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional
 
+from app.models.borrow import BorrowStatus
 from .book import BookResponse 
 
 class BorrowBase(BaseModel):
@@ -15,7 +16,7 @@ class BorrowResponse(BaseModel):
     borrow_date: datetime
     due_date: datetime
     return_date: Optional[datetime] = None
-    status: str
+    status: BorrowStatus
     book: BookResponse
 
     class Config:
@@ -10,6 +10,9 @@ class CategoryUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
 
+class CategoryBatchUpdate(CategoryUpdate):
+    id: int
+
 class CategoryResponse(BaseModel):
     id: int
     name: str
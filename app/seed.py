@@ -1,205 +1,257 @@
-from sqlalchemy.orm import Session
-from datetime import datetime, timezone
+import random
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from faker import Faker
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
 
 from app import models
+from app.models.borrow import BorrowStatus
 from app.utils.hashing import hash_password
+from app.utils.search import refresh_book_documents
+
+# Dữ liệu mẫu cố định. Mỗi lần chạy chỉ chèn các dòng còn thiếu (so theo tên/username/tiêu đề) nên chạy lại bao nhiêu lần cũng được.
+ROLES = ["admin", "user"]
+
+CATEGORIES = [
+    ("Linh tinh học", "Các sách còn phân vân chưa biết phân loại vào đâu"),
+    ("Khoa học viễn tưởng", "Sách về các chủ đề khoa học viễn tưởng"),
+    ("Khoa học tự nhiên", "Sách về các lĩnh vực khoa học"),
+    ("Xã hội học", "Sách về các vấn đề xã hội và con người"),
+    ("Toán học", "Sách về toán học và lý thuyết số"),
+    ("Văn học", "Các tác phẩm văn học nổi tiếng"),
+    ("Công nghệ", "Sách về công nghệ và kỹ thuật"),
+    ("Lịch sử", "Sách về các sự kiện lịch sử quan trọng"),
+    ("Triết học", "Các tác phẩm triết học kinh điển"),
+    ("Tâm lý học", "Sách về tâm lý và hành vi con người"),
+    ("Giáo dục", "Sách giáo khoa và tài liệu học thuật"),
+    ("Nghệ thuật", "Sách về nghệ thuật và thiết kế"),
+    ("Du lịch", "Sách hướng dẫn du lịch và khám phá thế giới"),
+]
+
+# (username, email, mật khẩu, phone, dob, is_active, role)
+USERS = [
+    ("admin1", "admin1@gmail.com", "admin1", "0913584413", "2000-01-01", 1, "admin"),
+    ("admin2", "admin2@gmail.com", "admin2", "0913584414", "2000-01-02", 1, "admin"),
+    ("Bảo đen", "baoden@gmail.com", "123456789", "0123456789", "2004-09-25", 1, "user"),
+    ("Nguyễn Văn A", "nguyenvana@gmail.com", "123456789", "0124561454", "2020-07-25", 0, "user"),
+    ("Phạm Hồng Nhung", "nhung.pham@gmail.com", "123456789", "0933445566", "2002-11-20", 1, "user"),
+    ("Park Boeun", "pb@gmail.com", "123456789", "0987654321", "1998-05-15", 1, "user"),
+    ("Zlatan Ibrahimović", "zlatan@gmail.com", "123456789", "0912341648", "1981-10-03", 1, "user"),
+    ("Nguyễn Thị Mai", "nguyenthi@gmail.com", "123456789", "0915891648", "1951-12-23", 1, "user"),
+    ("Lê Văn Tứ", "levantu@gmail.com", "123456789", "0914582678", "1960-11-21", 1, "user"),
+]
+
+AUTHORS = [
+    "Nguyễn Nhật Ánh", "Haruki Murakami", "J.K. Rowling", "George Orwell", "Albert Camus", "Isaac Asimov",
+    "Stephen King", "Jane Austen", "Mark Twain", "Charles Dickens", "Vũ Quốc Bảo",
+]
+
+# (title, tác giả chính, description, quantity, category)
+BOOKS = [
+    ("Khi lỗi thuộc về những vì sao", "Nguyễn Nhật Ánh",
+     "Một câu chuyện tình yêu đầy cảm động giữa hai người trẻ tuổi mắc bệnh ung thư.", 10, "Linh tinh học"),
+    ("Kafka bên bờ biển", "Haruki Murakami",
+     "Một tác phẩm kỳ ảo và sâu sắc về cuộc sống và số phận.", 5, "Khoa học viễn tưởng"),
+    ("Harry Potter và Hòn đá Phù thủy", "J.K. Rowling",
+     "Cuộc phiêu lưu của cậu bé phù thủy Harry Potter tại trường Hogwarts.", 15, "Khoa học tự nhiên"),
+    ("Bảo đen và những người bạn", "Vũ Quốc Bảo",
+     "Một tác phẩm kinh điển về những câu chuyện xoay quanh Bảo đen.", 102, "Linh tinh học"),
+]
+
+# Mật khẩu chung của user sinh bởi seed_scale
+LOAD_USER_PASSWORD = "loadtest"
+LOAD_USER_PREFIX = "loadtest_"
+
+
+# bcrypt chậm có chủ đích: mỗi mật khẩu chỉ băm một lần cho cả lần seed
+@lru_cache(maxsize=None)
+def _password_hash(password: str) -> str:
+    return hash_password(password)
+
+
+# Chèn (executemany) các dòng chưa có theo cột khóa key, trả về các dòng đã chèn
+def _insert_missing(db: Session, model, key: str, rows: list) -> list:
+    column = getattr(model, key)
+    existing = set(db.execute(select(column).where(column.in_([row[key] for row in rows]))).scalars())
+    missing = [row for row in rows if row[key] not in existing]
+    if missing:
+        db.execute(insert(model), missing)
+    return missing
+
+
+def _ids_by(db: Session, model, key: str) -> dict:
+    return dict(db.execute(select(getattr(model, key), model.id)).all())
+
 
 def seed_data(db: Session):
-    fake = Faker()
-
-    # Seed roles
-    if not db.query(models.Role).first():
-        roles = [
-            models.Role(name="admin"),
-            models.Role(name="user")
-        ]
-        db.add_all(roles)
-        db.commit()
+    now = datetime.now(timezone.utc)
 
-    # Seed categories
-    if not db.query(models.Category).first():
-        categories = [
-            models.Category(name="Linh tinh học", description="Các sách còn phân vân chưa biết phân loại vào đâu", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-            models.Category(name="Khoa học viễn tưởng", description="Sách về các chủ đề khoa học viễn tưởng", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-            models.Category(name="Khoa học tự nhiên", description="Sách về các lĩnh vực khoa học", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-            models.Category(name="Xã hội học", description="Sách về các vấn đề xã hội và con người", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-            models.Category(name="Toán học", description="Sách về toán học và lý thuyết số", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-            models.Category(name="Văn học", description="Các tác phẩm văn học nổi tiếng", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-            models.Category(name="Công nghệ", description="Sách về công nghệ và kỹ thuật", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-            models.Category(name="Lịch sử", description="Sách về các sự kiện lịch sử quan trọng", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-            models.Category(name="Triết học", description="Các tác phẩm triết học kinh điển", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-            models.Category(name="Tâm lý học", description="Sách về tâm lý và hành vi con người", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-            models.Category(name="Giáo dục", description="Sách giáo khoa và tài liệu học thuật", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-            models.Category(name="Nghệ thuật", description="Sách về nghệ thuật và thiết kế", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-            models.Category(name="Du lịch", description="Sách hướng dẫn du lịch và khám phá thế giới", created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc)),
-        ]
-        db.add_all(categories)
-        db.commit()
+    _insert_missing(db, models.Role, "name", [{"name": name} for name in ROLES])
+    _insert_missing(db, models.Category, "name", [
+        {"name": name, "description": description, "created_at": now, "updated_at": now}
+        for name, description in CATEGORIES
+    ])
+
+    role_ids = _ids_by(db, models.Role, "name")
+    _insert_missing(db, models.User, "username", [
+        {
+            "username": username,
+            "email": email,
+            "hashed_password": _password_hash(password),
+            "phone": phone,
+            "dob": datetime.fromisoformat(dob),
+            "is_active": is_active,
+            "role_id": role_ids[role],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for username, email, password, phone, dob, is_active, role in USERS
+    ])
+
+    _insert_missing(db, models.Author, "name", [{"name": name} for name in AUTHORS])
+
+    author_ids = _ids_by(db, models.Author, "name")
+    category_ids = _ids_by(db, models.Category, "name")
+    inserted = _insert_missing(db, models.Book, "title", [
+        {
+            "title": title,
+            "main_author_id": author_ids[author],
+            "description": description,
+            "quantity": quantity,
+            "category_id": category_ids[category],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for title, author, description, quantity, category in BOOKS
+    ])
+    # Chèn bằng core không qua event after_flush của ORM: tự cập nhật chỉ mục tìm kiếm
+    if inserted:
+        book_ids = db.execute(
+            select(models.Book.id).where(models.Book.title.in_([row["title"] for row in inserted]))
+        ).scalars().all()
+        refresh_book_documents(db.connection(), book_ids)
+
+    db.commit()
+
+
+def _count(db: Session, model) -> int:
+    return db.execute(select(func.count()).select_from(model)).scalar_one()
 
-    # Seed users
-    if not db.query(models.User).first():
-        users = [
-            models.User(
-                username="admin1", 
-                email="admin1@gmail.com", 
-                hashed_password=hash_password("admin1"), 
-                phone="0913584413", 
-                dob="2000-01-01",
-                is_active=1,
-                role_id=1,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc)
-            ),
-            models.User(
-                username="admin2", 
-                email="admin2@gmail.com", 
-                hashed_password=hash_password("admin2"), 
-                phone="0913584414", 
-                dob="2000-01-02",
-                is_active=1,
-                role_id=1,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc)
-            ),
-            models.User(
-                username="Bảo đen", 
-                email="baoden@gmail.com", 
-                hashed_password=hash_password("123456789"), 
-                phone="0123456789", 
-                dob="2004-09-25",
-                is_active=1,
-                role_id=2,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc)
-            ),
-            models.User(
-                username="Nguyễn Văn A", 
-                email="nguyenvana@gmail.com", 
-                hashed_password=hash_password("123456789"), 
-                phone="0124561454", 
-                dob="2020-07-25",
-                is_active=0,
-                role_id=2,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc)
-            ),
-            models.User(
-                username="Phạm Hồng Nhung",
-                email="nhung.pham@gmail.com",
-                hashed_password=hash_password("123456789"),
-                phone="0933445566",
-                dob="2002-11-20",
-                is_active=1,
-                role_id=2,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-            ),
-            models.User(
-                username="Park Boeun",
-                email="pb@gmail.com",
-                hashed_password=hash_password("123456789"),
-                phone="0987654321",
-                dob="1998-05-15",
-                is_active=1,
-                role_id=2,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-            ),
-            models.User(
-                username="Zlatan Ibrahimović",
-                email="zlatan@gmail.com",
-                hashed_password=hash_password("123456789"),
-                phone="0912341648",
-                dob="1981-10-03",
-                is_active=1,
-                role_id=2,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-            ),
-            models.User(
-                username="Nguyễn Thị Mai",
-                email="nguyenthi@gmail.com",
-                hashed_password=hash_password("123456789"),
-                phone="0915891648",
-                dob="1951-12-23",
-                is_active=1,
-                role_id=2,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-            ),
-            models.User(
-                username="Lê Văn Tứ",
-                email="levantu@gmail.com",
-                hashed_password=hash_password("123456789"),
-                phone="0914582678",
-                dob="1960-11-21",
-                is_active=1,
-                role_id=2,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-            )
-        ]
-        db.add_all(users)
-        db.commit()
 
-    # Seed authors
-    if not db.query(models.Author).first():
-        authors = [
-            models.Author(name="Nguyễn Nhật Ánh"),
-            models.Author(name="Haruki Murakami"),
-            models.Author(name="J.K. Rowling"),
-            models.Author(name="George Orwell"),
-            models.Author(name="Albert Camus"),
-            models.Author(name="Isaac Asimov"),
-            models.Author(name="Stephen King"),
-            models.Author(name="Jane Austen"),
-            models.Author(name="Mark Twain"),
-            models.Author(name="Charles Dickens"),
-            models.Author(name="Vũ Quốc Bảo"),
-        ]
-        db.add_all(authors)
+def _max_id(db: Session, model) -> int:
+    return db.execute(select(func.max(model.id))).scalar() or 0
+
+
+def _report(name: str, inserted: int, started: datetime):
+    seconds = max((datetime.now() - started).total_seconds(), 1e-9)
+    print(f"{name}: inserted {inserted} rows in {seconds:.1f}s ({inserted / seconds:,.0f} rows/s)")
+
+
+# Sinh dữ liệu lớn cho benchmark: nâng số dòng mỗi bảng lên tối thiểu bằng giá trị yêu cầu.
+# Chạy lại với cùng tham số không chèn thêm gì; mỗi lô dùng seed riêng nên dữ liệu sinh ra tái lập được.
+def seed_scale(db: Session, books: int = 0, users: int = 0, borrows: int = 0, authors: int = 0,
+               batch_size: int = 10_000, seed: int = 42):
+    seed_data(db)
+    fake = Faker("vi_VN")
+    now = datetime.now()
+
+    target = authors - _count(db, models.Author)
+    started = datetime.now()
+    for offset in range(0, max(target, 0), batch_size):
+        fake.seed_instance(seed + offset)
+        db.execute(insert(models.Author), [
+            {"name": fake.name(), "created_at": now, "updated_at": now}
+            for _ in range(min(batch_size, target - offset))
+        ])
         db.commit()
+    _report("authors", max(target, 0), started)
+
+    target = users - _count(db, models.User)
+    started = datetime.now()
+    if target > 0:
+        start = db.execute(
+            select(func.count()).where(models.User.username.like(f"{LOAD_USER_PREFIX}%"))
+        ).scalar_one()
+        role_id = _ids_by(db, models.Role, "name")["user"]
+        hashed = _password_hash(LOAD_USER_PASSWORD)
+        for offset in range(0, target, batch_size):
+            fake.seed_instance(seed + offset)
+            rows = []
+            for i in range(start + offset, start + min(offset + batch_size, target)):
+                rows.append({
+                    "username": f"{LOAD_USER_PREFIX}{i}",
+                    "email": f"{LOAD_USER_PREFIX}{i}@example.com",
+                    "hashed_password": hashed,
+                    "phone": f"9{i:09d}",
+                    "dob": fake.date_time_between("-70y", "-16y"),
+                    "is_active": 1,
+                    "role_id": role_id,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+            db.execute(insert(models.User), rows)
+            db.commit()
+    _report("users", max(target, 0), started)
+
+    target = books - _count(db, models.Book)
+    started = datetime.now()
+    if target > 0:
+        author_ids = db.execute(select(models.Author.id)).scalars().all()
+        category_ids = db.execute(select(models.Category.id)).scalars().all()
+        for offset in range(0, target, batch_size):
+            fake.seed_instance(seed + offset)
+            rng = random.Random(seed + offset)
+            first_id = _max_id(db, models.Book) + 1
+            db.execute(insert(models.Book), [
+                {
+                    "title": fake.sentence(nb_words=4).rstrip(".")[:100],
+                    "main_author_id": rng.choice(author_ids),
+                    "description": fake.paragraph(nb_sentences=2)[:500],
+                    "quantity": rng.randint(1, 50),
+                    "category_id": rng.choice(category_ids),
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for _ in range(min(batch_size, target - offset))
+            ])
+            book_ids = db.execute(select(models.Book.id).where(models.Book.id >= first_id)).scalars().all()
+            # Khoảng 1/5 số sách có thêm một đồng tác giả
+            co_authors = {(book_id, rng.choice(author_ids)) for book_id in book_ids if rng.random() < 0.2}
+            if co_authors:
+                db.execute(insert(models.BookAuthor), [
+                    {"book_id": book_id, "author_id": author_id} for book_id, author_id in co_authors
+                ])
+            refresh_book_documents(db.connection(), book_ids)
+            db.commit()
+    _report("books", max(target, 0), started)
 
-    # Seed books
-    if not db.query(models.Book).first():
-        books = [
-            models.Book(
-                title="Khi lỗi thuộc về những vì sao",
-                main_author_id=1,
-                description="Một câu chuyện tình yêu đầy cảm động giữa hai người trẻ tuổi mắc bệnh ung thư.",
-                quantity=10,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-                category_id=1
-            ),
-            models.Book(
-                title="Kafka bên bờ biển",
-                main_author_id=2,
-                description="Một tác phẩm kỳ ảo và sâu sắc về cuộc sống và số phận.",
-                quantity=5,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-                category_id=2
-            ),
-            models.Book(
-                title="Harry Potter và Hòn đá Phù thủy",
-                main_author_id=3,
-                description="Cuộc phiêu lưu của cậu bé phù thủy Harry Potter tại trường Hogwarts.",
-                quantity=15,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-                category_id=3
-            ),
-            models.Book(
-                title="Bảo đen và những người bạn",
-                main_author_id=11,
-                description="Một tác phẩm kinh điển về những câu chuyện xoay quanh Bảo đen.",
-                quantity=102,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-                category_id=1
-            ),
-        ]
-        db.add_all(books)
-        db.commit()
\ No newline at end of file
+    target = borrows - _count(db, models.Borrow)
+    started = datetime.now()
+    if target > 0:
+        user_ids = db.execute(select(models.User.id)).scalars().all()
+        book_ids = db.execute(select(models.Book.id)).scalars().all()
+        statuses = [BorrowStatus.returned] * 8 + [BorrowStatus.borrowing, BorrowStatus.overdue]
+        first_day = now - timedelta(days=3 * 365)
+        # Lượt mượn còn hiệu lực sinh ngẫu nhiên có thể trùng (user, book) với một lượt khác: bỏ qua dòng đó
+        ignore = "OR IGNORE" if db.get_bind().dialect.name == "sqlite" else "IGNORE"
+        inserted = 0
+        for offset in range(0, target, batch_size):
+            rng = random.Random(seed + offset)
+            rows = []
+            for _ in range(min(batch_size, target - offset)):
+                status = rng.choice(statuses)
+                borrow_date = first_day + timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+                rows.append({
+                    "user_id": rng.choice(user_ids),
+                    "book_id": rng.choice(book_ids),
+                    "borrow_date": borrow_date,
+                    "due_date": borrow_date + timedelta(days=14),
+                    "return_date": borrow_date + timedelta(days=rng.randint(1, 14))
+                    if status == BorrowStatus.returned else None,
+                    "status": status,
+                    "active": None if status == BorrowStatus.returned else True,
+                })
+            inserted += db.connection().execute(insert(models.Borrow).prefix_with(ignore), rows).rowcount
+            db.commit()
+        _report("borrows", inserted, started)
\ No newline at end of file
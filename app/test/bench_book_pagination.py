@@ -0,0 +1,91 @@
+# bench_book_pagination.py
+# So sánh thời gian lấy một trang sách giữa cách cũ (query.all() rồi paginate trong Python)
+# và cách mới (LIMIT/OFFSET + COUNT trong SQL) khi số lượng sách tăng dần.
+#
+# Chạy: python -m app.test.bench_book_pagination [số_sách ...]
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi_pagination import Params, paginate as paginate_list
+from fastapi_pagination.ext.sqlalchemy import paginate
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, joinedload
+
+from app import models
+from app.database import Base
+from app.utils.book_query import build_book_query, books_to_response
+
+PAGE_SIZE = 50
+REPEAT = 5
+
+
+def seed_catalog(session: Session, size: int):
+    session.execute(insert(models.Category), [{"name": f"Category {i}"} for i in range(20)])
+    session.execute(insert(models.Author), [{"name": f"Author {i}"} for i in range(1000)])
+    session.execute(insert(models.Book), [
+        {
+            "title": f"Book {i:07d}",
+            "main_author_id": i % 1000 + 1,
+            "description": "Lorem ipsum dolor sit amet",
+            "quantity": 10,
+            "category_id": i % 20 + 1,
+        }
+        for i in range(size)
+    ])
+    session.execute(insert(models.BookAuthor), [
+        {"book_id": i + 1, "author_id": (i + 7) % 1000 + 1} for i in range(0, size, 3)
+    ])
+    session.commit()
+
+
+def legacy_page(session: Session, page: int):
+    books = session.query(models.Book)\
+        .options(joinedload(models.Book.main_author),
+                 joinedload(models.Book.authors),
+                 joinedload(models.Book.category))\
+        .group_by(models.Book.id)\
+        .order_by(models.Book.id.asc())\
+        .all()
+    return paginate_list(books_to_response(books), Params(page=page, size=PAGE_SIZE))
+
+
+def sql_page(session: Session, page: int):
+    return paginate(session, build_book_query(), Params(page=page, size=PAGE_SIZE),
+                    transformer=books_to_response)
+
+
+def measure(fn, session: Session, page: int):
+    samples = []
+    for _ in range(REPEAT):
+        session.expunge_all()
+        start = time.perf_counter()
+        fn(session, page)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 50_000]
+
+    print("=" * 60)
+    print(f"{'books':>10} | {'legacy p1 (ms)':>15} | {'sql p1 (ms)':>12} | {'sql mid (ms)':>12}")
+    print("=" * 60)
+    for size in sizes:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            seed_catalog(session, size)
+            middle = max(size // PAGE_SIZE // 2, 1)
+            legacy = measure(legacy_page, session, 1)
+            first = measure(sql_page, session, 1)
+            mid = measure(sql_page, session, middle)
+        engine.dispose()
+        print(f"{size:>10} | {legacy:>15.1f} | {first:>12.1f} | {mid:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
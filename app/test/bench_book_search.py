@@ -0,0 +1,82 @@
+# bench_book_search.py
+# So sánh tìm sách bằng ILIKE '%x%' (quét toàn bảng) với chỉ mục toàn văn (FTS5 trên SQLite).
+#
+# Chạy: python -m app.test.bench_book_search [số_sách]
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi_pagination import Params
+from fastapi_pagination.ext.sqlalchemy import paginate
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import Base
+from app.utils.book_query import build_book_query, books_to_response
+from app.utils.search import rebuild_search_index
+
+REPEAT = 5
+ONSETS = ["b", "c", "d", "đ", "g", "h", "kh", "l", "m", "n", "ngh", "ph", "qu", "s", "t", "th", "tr", "v", "x", "gi"]
+VOWELS = ["a", "à", "á", "ả", "ã", "ạ", "ơ", "ờ", "ớ", "ê", "ế", "ô", "ố", "ư", "ừ", "i", "ì", "u", "ú", "y"]
+CODAS = ["", "n", "ng", "nh", "m", "c", "t", "p"]
+# Khoảng 3200 âm tiết khác nhau để mỗi từ khóa chỉ khớp một phần nhỏ danh mục, giống dữ liệu thật
+WORDS = [onset + vowel + coda for onset in ONSETS for vowel in VOWELS for coda in CODAS]
+SEARCHES = [("thừng", "thung"), ("quớc", "quoc"), ("đạn", "dan"), ("khốm", "khom")]
+
+
+def seed_catalog(session: Session, size: int):
+    rng = random.Random(42)
+    session.execute(insert(models.Category), [{"name": "Văn học"}])
+    session.execute(insert(models.Author), [{"name": f"Tác giả {i}"} for i in range(500)])
+    session.execute(insert(models.Book), [
+        {
+            "title": " ".join(rng.sample(WORDS, 4)).capitalize(),
+            "main_author_id": rng.randint(1, 500),
+            "description": " ".join(rng.sample(WORDS, 8)),
+            "quantity": 1,
+            "category_id": 1,
+        }
+        for _ in range(size)
+    ])
+    session.commit()
+    rebuild_search_index(session)
+
+
+def measure(session: Session, query):
+    samples = []
+    for _ in range(REPEAT):
+        session.expunge_all()
+        start = time.perf_counter()
+        page = paginate(session, query, Params(page=1, size=20), transformer=books_to_response)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), page.total
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        start = time.perf_counter()
+        seed_catalog(session, size)
+        print(f"Seeded and indexed {size} books in {time.perf_counter() - start:.1f}s")
+
+        print("=" * 72)
+        print(f"{'search':>12} | {'ilike (ms)':>10} | {'hits':>7} | {'fulltext (ms)':>13} | {'hits':>7} | {'no accents':>10}")
+        print("=" * 72)
+        for accented, folded in SEARCHES:
+            ilike_ms, ilike_hits = measure(session, build_book_query(title=accented))
+            fts_ms, fts_hits = measure(session, build_book_query(q=accented, dialect="sqlite"))
+            _, folded_hits = measure(session, build_book_query(q=folded, dialect="sqlite"))
+            print(f"{accented:>12} | {ilike_ms:>10.1f} | {ilike_hits:>7} | {fts_ms:>13.1f} | {fts_hits:>7} | {folded_hits:>10}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
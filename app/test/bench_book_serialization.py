@@ -0,0 +1,112 @@
+# bench_book_serialization.py
+# Đo thông lượng chuyển sách ORM -> BookResponse -> JSON cho 10k sách đã nạp sẵn (không tính thời gian truy vấn):
+# cách cũ dựng BookResponse bằng tay (hai lần datetime.now() mỗi sách) so với validate từ ORM bằng from_attributes.
+#
+# Chạy: python -m app.test.bench_book_serialization [số_sách]
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+for name in ("KEYCLOAK_URL", "KEYCLOAK_REALM", "KEYCLOAK_CLIENT_ID", "KEYCLOAK_CLIENT_SECRET"):
+    os.environ.setdefault(name, "bench")
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app import models
+from app.database import Base
+from app.schemas.book import BookResponse
+from app.utils.book_query import book_load_options, books_to_response
+
+REPEAT = 5
+BOOK_LIST = TypeAdapter(list[BookResponse])
+
+
+def seed_catalog(session: Session, size: int):
+    now = datetime.now(timezone.utc)
+    session.execute(insert(models.Category), [{"name": f"Category {i}"} for i in range(20)])
+    session.execute(insert(models.Author), [{"name": f"Author {i}", "created_at": now, "updated_at": now}
+                                            for i in range(1000)])
+    session.execute(insert(models.Book), [
+        {
+            "title": f"Book {i:07d}",
+            "main_author_id": i % 1000 + 1,
+            "description": "Lorem ipsum dolor sit amet",
+            "quantity": 10,
+            "category_id": i % 20 + 1,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(size)
+    ])
+    session.execute(insert(models.BookAuthor), [
+        {"book_id": i + 1, "author_id": (i + 7) % 1000 + 1} for i in range(0, size, 3)
+    ])
+    session.commit()
+
+
+# Cách cũ (trước khi đổi sang from_attributes)
+def legacy_books_to_response(books):
+    book_response = []
+    for book in books:
+        book_response.append(BookResponse(
+            id=book.id,
+            title=book.title,
+            main_author=book.main_author,
+            authors=[ba.author for ba in book.book_authors],
+            description=book.description,
+            quantity=book.quantity,
+            created_at=datetime.now(timezone.utc),
+            updated_at=datetime.now(timezone.utc),
+            category_id=book.category_id,
+            category=book.category.name if book.category else None
+        ))
+    return book_response
+
+
+def per_model_validate(books):
+    return [BookResponse.model_validate(book) for book in books]
+
+
+def measure(fn, books):
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        BOOK_LIST.dump_json(fn(books))
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed_catalog(session, size)
+        # Nạp cả hai đường tới tác giả phụ để mọi cách đều đọc từ bộ nhớ
+        books = session.scalars(
+            select(models.Book).options(*book_load_options(),
+                                        selectinload(models.Book.book_authors).joinedload(models.BookAuthor.author))
+        ).all()
+        assert [book.model_dump(exclude={"created_at", "updated_at"}) for book in legacy_books_to_response(books)] \
+            == [book.model_dump(exclude={"created_at", "updated_at"}) for book in books_to_response(books)]
+
+        results = [("legacy manual", measure(legacy_books_to_response, books)),
+                   ("model_validate", measure(per_model_validate, books)),
+                   ("TypeAdapter list", measure(books_to_response, books))]
+    engine.dispose()
+
+    print("=" * 56)
+    print(f"{size} books, ORM -> BookResponse -> JSON, median of {REPEAT}")
+    print(f"{'method':>18} | {'ms':>8} | {'books/s':>10}")
+    for name, seconds in results:
+        print(f"{name:>18} | {seconds * 1000:>8.1f} | {size / seconds:>10,.0f}")
+    print("=" * 56)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# bench_hashing.py
+# Đo độ trễ event loop khi có một loạt đăng nhập cùng lúc: bcrypt gọi trực tiếp trong coroutine
+# so với bcrypt chạy trên thread pool giới hạn (verify_password_async).
+#
+# Chạy: python -m app.test.bench_hashing [số_lần_đăng_nhập]
+import asyncio
+import os
+import sys
+import time
+
+for name, value in {"KEYCLOAK_URL": "http://keycloak.invalid", "KEYCLOAK_REALM": "bench",
+                    "KEYCLOAK_CLIENT_ID": "bench", "KEYCLOAK_CLIENT_SECRET": "bench",
+                    "DATABASE_URL": "sqlite://"}.items():
+    os.environ.setdefault(name, value)
+
+from app.utils.hashing import hash_password, hashing_stats, verify_password, verify_password_async
+
+
+# Đo khoảng dừng lớn nhất của event loop: một coroutine ngủ 10ms liên tục và ghi lại độ trễ thực tế
+async def watch_loop(stop: asyncio.Event, stalls: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        stalls.append((time.perf_counter() - start - 0.01) * 1000)
+
+
+async def measure(verify, logins: int, hashed: str):
+    stop, stalls = asyncio.Event(), []
+    watcher = asyncio.create_task(watch_loop(stop, stalls))
+    start = time.perf_counter()
+    await asyncio.gather(*[verify("123456789", hashed) for _ in range(logins)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await watcher
+    return elapsed, max(stalls)
+
+
+async def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    hashed = hash_password("123456789")
+
+    async def verify_inline(plain, hashed_password):
+        return verify_password(plain, hashed_password)
+
+    inline_total, inline_stall = await measure(verify_inline, logins, hashed)
+    pool_total, pool_stall = await measure(verify_password_async, logins, hashed)
+
+    print("=" * 60)
+    print(f"{logins} concurrent logins")
+    print(f"{'bcrypt':>12} | {'total (s)':>10} | {'max loop stall (ms)':>20}")
+    print(f"{'inline':>12} | {inline_total:>10.2f} | {inline_stall:>20.1f}")
+    print(f"{'thread pool':>12} | {pool_total:>10.2f} | {pool_stall:>20.1f}")
+    print(f"stats: {hashing_stats()}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
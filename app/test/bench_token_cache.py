@@ -0,0 +1,71 @@
+# bench_token_cache.py
+# Đo chi phí xác minh token mỗi request khi có và không có cache token đã xác minh.
+# Không cần Keycloak: tự sinh khóa RSA và JWKS giả.
+#
+# Chạy: python -m app.test.bench_token_cache [số_request]
+import asyncio
+import base64
+import os
+import sys
+import time
+
+for name, value in {"KEYCLOAK_URL": "http://keycloak.invalid", "KEYCLOAK_REALM": "bench",
+                    "KEYCLOAK_CLIENT_ID": "bench", "KEYCLOAK_CLIENT_SECRET": "bench",
+                    "DATABASE_URL": "sqlite://"}.items():
+    os.environ.setdefault(name, value)
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+
+from app.auth import jwt_handler
+from app.utils.cache import LRUCache
+
+
+def _b64(number: int) -> str:
+    raw = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def make_signing_key(kid: str):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()).decode()
+    numbers = private_key.public_key().public_numbers()
+    jwk = {"kid": kid, "kty": "RSA", "use": "sig", "alg": "RS256", "n": _b64(numbers.n), "e": _b64(numbers.e)}
+    return pem, jwk
+
+
+async def measure(token: str, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        await jwt_handler.verify_token(token)
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    pem, jwk = make_signing_key("bench-key")
+
+    async def fake_fetch_jwks():
+        return {"keys": [jwk]}
+
+    jwt_handler.fetch_jwks = fake_fetch_jwks
+    token = jwt.encode({"sub": "bench", "preferred_username": "bench", "exp": int(time.time()) + 3600},
+                       pem, algorithm="RS256", headers={"kid": "bench-key"})
+    await jwt_handler.verify_token(token)  # Nạp JWKS trước khi đo
+
+    jwt_handler._token_cache = LRUCache(0)
+    uncached = await measure(token, requests)
+    jwt_handler._token_cache = LRUCache(1000)
+    cached = await measure(token, requests)
+
+    print("=" * 50)
+    print(f"verify_token without cache: {uncached:8.1f} µs/request")
+    print(f"verify_token with cache:    {cached:8.1f} µs/request")
+    print(f"speedup: {uncached / cached:.0f}x")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
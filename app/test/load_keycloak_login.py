@@ -0,0 +1,141 @@
+# load_keycloak_login.py
+# Load test đăng nhập qua một Keycloak giả (ASGI nhỏ chạy bằng uvicorn, có TLS tự ký):
+# so sánh tạo httpx.AsyncClient mới cho mỗi lần gọi với client dùng chung có connection pool.
+#
+# Chạy: python -m app.test.load_keycloak_login [số_request] [số_request_đồng_thời]
+# Lưu ý: stub và client chạy cùng máy; đồng thời quá cao làm stub bão hoà CPU và p99 chỉ còn đo hàng đợi của stub.
+import asyncio
+import datetime
+import ipaddress
+import json
+import os
+import socket
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+REALM = "stub"
+STUB_LATENCY = 0.02  # Thời gian xử lý giả lập của Keycloak cho mỗi request (giây)
+
+
+async def keycloak_stub(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    while (await receive()).get("more_body"):
+        pass
+    await asyncio.sleep(STUB_LATENCY)
+    body = json.dumps({"access_token": "stub-access", "refresh_token": "stub-refresh",
+                       "token_type": "Bearer"}).encode()
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def write_self_signed_cert(directory: str):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = x509.CertificateBuilder().subject_name(name).issuer_name(name)\
+        .public_key(key.public_key()).serial_number(x509.random_serial_number())\
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))\
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)\
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)\
+        .sign(key, hashes.SHA256())
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+# Keycloak giả chạy ở process riêng để không tranh GIL với client đang đo
+def start_stub(cert_path: str, key_path: str):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.test.load_keycloak_login:keycloak_stub",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        "--ssl-certfile", cert_path, "--ssl-keyfile", key_path,
+    ])
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.05)
+
+
+async def run_load(login, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await login()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*[one() for _ in range(requests)])
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    tmp = tempfile.mkdtemp()
+    cert_path, key_path = write_self_signed_cert(tmp)
+    process, port = start_stub(cert_path, key_path)
+
+    for name, value in {"KEYCLOAK_URL": f"https://127.0.0.1:{port}", "KEYCLOAK_REALM": REALM,
+                        "KEYCLOAK_CLIENT_ID": "stub", "KEYCLOAK_CLIENT_SECRET": "stub",
+                        "KEYCLOAK_HTTP_VERIFY": cert_path, "DATABASE_URL": "sqlite://"}.items():
+        os.environ[name] = value
+
+    from app.auth.http_client import close_keycloak_client
+    from app.routes.auth import login_for_access_token
+
+    form = SimpleNamespace(username="load", password="load")
+    token_url = f"https://127.0.0.1:{port}/realms/{REALM}/protocol/openid-connect/token"
+    context = ssl.create_default_context(cafile=cert_path)
+
+    # Cách cũ: mỗi lần đăng nhập một client mới -> TCP + TLS handshake mới
+    async def login_new_client():
+        async with httpx.AsyncClient(verify=context) as client:
+            response = await client.post(token_url, data={"grant_type": "password", "username": "load",
+                                                          "password": "load"})
+            response.raise_for_status()
+
+    async def login_shared_client():
+        await login_for_access_token(form)
+
+    await run_load(login_shared_client, concurrency, concurrency)  # Làm nóng pool
+    new_p50, new_p99 = await run_load(login_new_client, requests, concurrency)
+    shared_p50, shared_p99 = await run_load(login_shared_client, requests, concurrency)
+    await close_keycloak_client()
+    process.terminate()
+
+    print("=" * 56)
+    print(f"{requests} logins, concurrency {concurrency}, TLS stub on port {port}")
+    print(f"{'client':>16} | {'p50 (ms)':>10} | {'p99 (ms)':>10}")
+    print(f"{'new per call':>16} | {new_p50:>10.2f} | {new_p99:>10.2f}")
+    print(f"{'shared pool':>16} | {shared_p50:>10.2f} | {shared_p99:>10.2f}")
+    print("=" * 56)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+# query_count.py
+# Đếm số câu SQL gửi tới database trong một khối lệnh, để test khẳng định một endpoint chạy
+# số câu truy vấn cố định bất kể trả về bao nhiêu dòng (bắt lỗi N+1 do lazy load).
+#
+#   with assert_max_queries(3, engine):
+#       client.get("/user/borrows/history")
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+class QueryCounter:
+    def __init__(self, *engines):
+        # AsyncEngine: sự kiện nằm trên sync_engine bên dưới
+        self.engines = [getattr(engine, "sync_engine", engine) for engine in engines]
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._record)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def assert_max_queries(limit: int, *engines):
+    with QueryCounter(*engines) as counter:
+        yield counter
+    if counter.count > limit:
+        listed = "\n".join(f"  {i}. {' '.join(sql.split())[:200]}" for i, sql in enumerate(counter.statements, 1))
+        raise AssertionError(f"expected at most {limit} queries, got {counter.count}:\n{listed}")
\ No newline at end of file
@@ -0,0 +1,122 @@
+# stress_borrow.py
+# Nhiều luồng cùng mượn một đầu sách để kiểm tra borrow_book không bán quá số lượng:
+# số lượng không bao giờ âm, số lượt mượn thành công đúng bằng số sách có, mỗi user chỉ mượn được một lần.
+# Mỗi user được giao cho hai luồng để có request song song của cùng một người.
+#
+# Chạy: python -m app.test.stress_borrow [số_luồng] [số_user] [số_lượng_sách]
+# Mặc định dùng một file SQLite tạm; đặt STRESS_DATABASE_URL (ví dụ mysql+pymysql://...) để chạy trên
+# một database MySQL trống dành riêng cho việc test.
+import asyncio
+import collections
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+for name in ("KEYCLOAK_URL", "KEYCLOAK_REALM", "KEYCLOAK_CLIENT_ID", "KEYCLOAK_CLIENT_SECRET"):
+    os.environ.setdefault(name, "stress")
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import models
+from app.auth.principal import Principal
+from app.database import Base, to_async_url
+from app.routes.user.borrow_u import borrow_book
+
+
+def setup_database(url: str, users: int, stock: int) -> int:
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Role), [{"name": "user"}])
+        conn.execute(insert(models.Category), [{"name": "Văn học"}])
+        conn.execute(insert(models.Author), [{"name": "Tác giả"}])
+        conn.execute(insert(models.User), [
+            {"username": f"stress{i}", "email": f"stress{i}@example.com", "hashed_password": "",
+             "phone": f"09{i:08d}", "is_active": 1, "role_id": 1}
+            for i in range(1, users + 1)
+        ])
+        book_id = conn.execute(insert(models.Book).values(
+            title="Sách hot", main_author_id=1, quantity=stock, category_id=1
+        )).inserted_primary_key[0]
+    engine.dispose()
+    return book_id
+
+
+def worker(url: str, book_id: int, user_ids: list, outcomes: collections.Counter, lock: threading.Lock):
+    async def run():
+        # Engine async gắn với event loop nên mỗi luồng có engine riêng
+        engine = create_async_engine(to_async_url(url), connect_args={"timeout": 30} if url.startswith("sqlite") else {})
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        for user_id in user_ids:
+            principal = Principal(id=user_id, username=f"stress{user_id}", role="user", is_active=1)
+            async with session_factory() as db:
+                try:
+                    await borrow_book(book_id, db=db, current_user=principal)
+                    outcome = "borrowed"
+                except HTTPException as e:
+                    outcome = e.detail
+            with lock:
+                outcomes[outcome] += 1
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    stock = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+    url = os.getenv("STRESS_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}"
+
+    book_id = setup_database(url, users, stock)
+
+    # Luồng t và t + threads/2 xử lý cùng một nhóm user
+    groups = max(threads // 2, 1)
+    assignments = [[u for u in range(1, users + 1) if u % groups == t % groups] for t in range(threads)]
+    outcomes, lock = collections.Counter(), threading.Lock()
+    workers = [threading.Thread(target=worker, args=(url, book_id, ids, outcomes, lock)) for ids in assignments]
+
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        quantity = conn.scalar(select(models.Book.quantity).where(models.Book.id == book_id))
+        active = conn.scalar(select(func.count()).select_from(models.Borrow).where(models.Borrow.active.is_(True)))
+        max_per_user = conn.scalar(
+            select(func.count()).select_from(models.Borrow)
+            .where(models.Borrow.active.is_(True))
+            .group_by(models.Borrow.user_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        ) or 0
+    engine.dispose()
+
+    attempts = sum(outcomes.values())
+    print("=" * 60)
+    print(f"{threads} threads, {users} users x 2 attempts, stock {stock}")
+    for outcome, count in outcomes.most_common():
+        print(f"  {outcome:<40} {count:>6}")
+    print(f"final quantity: {quantity}, active borrows: {active}, max active per user: {max_per_user}")
+    print(f"throughput: {attempts / elapsed:.0f} borrow attempts/s ({elapsed:.2f}s)")
+    print("=" * 60)
+
+    assert quantity >= 0, "stock went negative"
+    assert quantity + active == stock, "stock and active borrows do not add up"
+    assert outcomes["borrowed"] == min(stock, users), "unexpected number of successful borrows"
+    assert max_per_user <= 1, "a user holds two active borrows of the same book"
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
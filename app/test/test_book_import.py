@@ -0,0 +1,86 @@
+# test_book_import.py
+# Nhập sách theo lô: mỗi lô là một câu INSERT nhiều dòng cho sách (và cho tác giả mới), không phải một câu mỗi dòng,
+# và id lấy lại được phải khớp đúng từng dòng (tác giả chính, tác giả phụ) kể cả khi tên sách trùng nhau.
+# Chạy cả cách lấy id trực tiếp (RETURNING / dải id liên tiếp của MySQL) lẫn cách đọc lại theo khóa tự nhiên.
+#
+# Chạy: pytest app/test/test_book_import.py
+# Đặt TEST_DATABASE_URL để chạy trên database MySQL trống dành riêng cho test; mặc định dùng một file SQLite tạm.
+import os
+import tempfile
+
+for name, value in {"KEYCLOAK_URL": "http://keycloak.invalid", "KEYCLOAK_REALM": "test",
+                    "KEYCLOAK_CLIENT_ID": "test", "KEYCLOAK_CLIENT_SECRET": "test",
+                    "DATABASE_URL": "sqlite://"}.items():
+    os.environ.setdefault(name, value)
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import Base
+from app.test.query_count import QueryCounter
+from app.utils import book_io
+from app.utils.search import ensure_search_index
+
+ROWS = 2500
+CHUNK = 1000
+
+
+def make_records():
+    for i in range(ROWS):
+        yield i + 2, {
+            "title": f"Book {i % 700}",  # Tên trùng nhau trong cùng lô
+            "main_author": f"Author {i % 300}",
+            "authors": [f"Author {(i + 1) % 300}", f"Co-author {i % 1500}"],
+            "quantity": i % 7,
+            "category": "Category 1" if i % 2 else "category 0",
+        }
+
+
+@pytest.fixture
+def engine():
+    url = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'import.db')}"
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Category), [{"name": "Category 0"}, {"name": "Category 1"}])
+        conn.execute(insert(models.Author), [{"name": "Author 0"}])
+    with Session(engine) as db:
+        ensure_search_index(db)
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("ids", ["direct", "select_back"])
+def test_import_inserts_in_chunks(engine, ids, monkeypatch):
+    if ids == "select_back":
+        monkeypatch.setattr(engine.dialect, "insert_returning", False)
+        monkeypatch.setattr(book_io, "_autoinc_ids_are_consecutive", lambda conn: False)
+
+    with QueryCounter(engine) as counter, Session(engine) as db:
+        importer = book_io.BookImporter(db, chunk_size=CHUNK)
+        for line, record in make_records():
+            importer.add(line, record)
+        result = importer.finish()
+    assert result == {"imported": ROWS, "failed": 0, "errors": []}
+
+    inserts = [sql for sql in counter.statements if sql.lstrip().upper().startswith("INSERT INTO")]
+    chunks = -(-ROWS // CHUNK)
+    assert sum("INSERT INTO books " in sql for sql in inserts) == chunks
+    assert sum("INSERT INTO authors " in sql for sql in inserts) <= chunks
+    assert sum("INSERT INTO book_authors " in sql for sql in inserts) == chunks
+
+    with Session(engine) as db:
+        authors = {author_id: name for author_id, name in db.execute(select(models.Author.id, models.Author.name))}
+        books = db.execute(select(models.Book.id, models.Book.title, models.Book.main_author_id, models.Book.quantity)
+                           .order_by(models.Book.id)).all()
+        links = {}
+        for book_id, author_id in db.execute(select(models.BookAuthor.book_id, models.BookAuthor.author_id)):
+            links.setdefault(book_id, set()).add(authors[author_id])
+    assert len(authors) == 300 + 1500
+
+    for (book_id, title, main_author_id, quantity), (_, record) in zip(books, make_records(), strict=True):
+        assert (title, authors[main_author_id], quantity) == (record["title"], record["main_author"], record["quantity"])
+        assert links[book_id] == set(record["authors"]) - {record["main_author"]}
\ No newline at end of file
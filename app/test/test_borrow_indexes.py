@@ -0,0 +1,125 @@
+# test_borrow_indexes.py
+# Kiểm tra bằng EXPLAIN rằng các truy vấn mượn sách theo user dùng index của bảng borrows
+# thay vì quét toàn bảng, trên một bảng borrows có hàng triệu dòng.
+#
+# Chạy: python -m app.test.test_borrow_indexes  hoặc  pytest app/test/test_borrow_indexes.py
+# Số dòng: BORROW_INDEX_ROWS (mặc định 2 triệu). Đặt TEST_DATABASE_URL để chạy trên database MySQL trống
+# dành riêng cho test; mặc định dùng một file SQLite tạm.
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+for name in ("KEYCLOAK_URL", "KEYCLOAK_REALM", "KEYCLOAK_CLIENT_ID", "KEYCLOAK_CLIENT_SECRET"):
+    os.environ.setdefault(name, "test")
+
+import pytest
+from sqlalchemy import create_engine, insert, select, text
+
+from app import models
+from app.database import Base
+from app.models.borrow import BorrowStatus
+from app.routes.user.borrow_u import active_borrow_query, borrow_history_query, current_borrows_query
+
+ROWS = int(os.getenv("BORROW_INDEX_ROWS", 2_000_000))
+USERS = 50_000
+BOOKS = 20_000
+CHUNK = 50_000
+
+
+def seed_borrows(engine, rows: int):
+    rng = random.Random(7)
+    start = datetime(2020, 1, 1)
+    statuses = [BorrowStatus.returned] * 8 + [BorrowStatus.borrowing, BorrowStatus.overdue]
+    with engine.begin() as conn:
+        for offset in range(0, rows, CHUNK):
+            batch = []
+            for _ in range(min(CHUNK, rows - offset)):
+                status = rng.choice(statuses)
+                borrow_date = start + timedelta(minutes=rng.randint(0, 3_000_000))
+                batch.append({
+                    "user_id": rng.randint(1, USERS),
+                    "book_id": rng.randint(1, BOOKS),
+                    "borrow_date": borrow_date,
+                    "due_date": borrow_date + timedelta(days=14),
+                    "return_date": borrow_date + timedelta(days=7) if status == BorrowStatus.returned else None,
+                    "status": status,
+                    "active": None if status == BorrowStatus.returned else True,
+                })
+            # Bỏ qua trùng (user, book) còn hiệu lực do sinh ngẫu nhiên
+            conn.execute(insert(models.Borrow).prefix_with("OR IGNORE" if engine.dialect.name == "sqlite" else "IGNORE"), batch)
+        conn.execute(text("ANALYZE"))
+
+
+# Liệt kê các vấn đề trong kế hoạch thực thi của bảng borrows: quét toàn bảng, sắp xếp bằng bảng tạm,
+# hoặc không dùng đúng index mong đợi
+def plan_problems(engine, statement, index: str) -> list:
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    problems = []
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            details = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()]
+            borrows = [d for d in details if " borrows " in f"{d} "]
+            if any(d.startswith("SCAN borrows") for d in borrows):
+                problems.append("full scan")
+            if any(d.startswith("USE TEMP B-TREE") for d in details):
+                problems.append("sort in temp b-tree")
+            if not any(index in d for d in borrows):
+                problems.append(f"{index} not used: {borrows}")
+            return problems
+
+        rows = [row for row in conn.execute(text(f"EXPLAIN {sql}")).mappings().all() if row["table"] == "borrows"]
+        if any(row["type"] == "ALL" for row in rows):
+            problems.append("full scan")
+        if any("filesort" in (row["Extra"] or "") for row in rows):
+            problems.append("filesort")
+        if not any(row["key"] == index for row in rows):
+            problems.append(f"{index} not used: {[row['key'] for row in rows]}")
+    return problems
+
+
+def seeded_engine():
+    url = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'borrows.db')}"
+    engine = create_engine(url)
+    models.Borrow.__table__.drop(engine, checkfirst=True)
+    Base.metadata.create_all(engine)
+    started = time.perf_counter()
+    seed_borrows(engine, ROWS)
+    print(f"seeded {ROWS} borrows in {time.perf_counter() - started:.1f}s")
+    return engine
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = seeded_engine()
+    yield engine
+    engine.dispose()
+
+
+QUERIES = {
+    "current borrows": (lambda: current_borrows_query(123), "ix_borrows_user_status_borrow_date"),
+    "borrow history": (lambda: borrow_history_query(123).order_by(models.Borrow.borrow_date.desc()),
+                       "ix_borrows_user_status_borrow_date"),
+    "existing borrow check": (lambda: active_borrow_query(123, 456), "ix_borrows_user_book_status"),
+    "overdue sweep": (lambda: select(models.Borrow.id)
+                      .where(models.Borrow.status == BorrowStatus.borrowing,
+                             models.Borrow.due_date < datetime(2024, 1, 1))
+                      .order_by(models.Borrow.due_date).limit(500),
+                      "ix_borrows_status_due_date"),
+}
+
+
+@pytest.mark.parametrize("name", QUERIES)
+def test_borrow_queries_use_indexes(engine, name):
+    build, index = QUERIES[name]
+    assert plan_problems(engine, build(), index) == []
+
+
+if __name__ == "__main__":
+    test_db = seeded_engine()
+    for query_name, (build, index) in QUERIES.items():
+        problems = plan_problems(test_db, build(), index)
+        print(f"{query_name:<24} {'; '.join(problems) if problems else 'OK (' + index + ')'}")
+    test_db.dispose()
\ No newline at end of file
@@ -0,0 +1,125 @@
+# test_catalog_cache.py
+# Cache catalog dùng chung không được phá read-your-writes: sau khi một user mượn sách (ghi trên primary),
+# user khác đọc từ replica còn trễ không được đưa bản cũ vào cache, và chính user vừa ghi luôn thấy dữ liệu mới.
+#
+# Chạy: pytest app/test/test_catalog_cache.py
+import os
+import tempfile
+import time
+from datetime import datetime
+
+for name, value in {"KEYCLOAK_URL": "http://keycloak.invalid", "KEYCLOAK_REALM": "test",
+                    "KEYCLOAK_CLIENT_ID": "test", "KEYCLOAK_CLIENT_SECRET": "test",
+                    "DATABASE_URL": "sqlite://", "OVERDUE_SWEEP_ENABLED": "false"}.items():
+    os.environ.setdefault(name, value)
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy import create_engine, insert, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import database, dependencies, models
+from app.auth import jwt_handler
+from app.database import AsyncRoutingSession, Base
+from app.main import app
+from app.test.bench_token_cache import make_signing_key
+from app.test.query_count import QueryCounter
+from app.utils import catalog_cache
+from app.utils.cache import LRUCache
+
+BOOKS = "/user/books/?size=10"
+
+
+def create_database(path: str):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    now = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Role), [{"name": "admin"}, {"name": "user"}])
+        conn.execute(insert(models.Category), [{"name": "Category"}])
+        conn.execute(insert(models.Author), [{"name": "Author"}])
+        conn.execute(insert(models.Book), [{"title": "Book", "main_author_id": 1, "quantity": 5, "category_id": 1,
+                                            "created_at": now, "updated_at": now}])
+    return engine, create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+
+# Primary và replica là hai file SQLite riêng; replica không bao giờ tự đồng bộ (mô phỏng replica trễ)
+@pytest.fixture
+def databases(monkeypatch):
+    directory = tempfile.mkdtemp()
+    primary, async_primary = create_database(os.path.join(directory, "primary.db"))
+    replica, async_replica = create_database(os.path.join(directory, "replica.db"))
+    for name, value in {"engine": primary, "async_engine": async_primary,
+                        "replica_engine": replica, "async_replica_engine": async_replica}.items():
+        monkeypatch.setattr(database, name, value)
+
+    PrimarySession = async_sessionmaker(async_primary, autoflush=False, expire_on_commit=False)
+    ReadSession = async_sessionmaker(sync_session_class=AsyncRoutingSession, autoflush=False, expire_on_commit=False)
+
+    async def get_async_db():
+        async with PrimarySession() as db:
+            yield db
+
+    async def get_async_read_db():
+        async with ReadSession() as db:
+            yield db
+
+    app.dependency_overrides.update({dependencies.get_async_db: get_async_db,
+                                     dependencies.get_async_read_db: get_async_read_db})
+    catalog_cache.bump_catalog_version()
+    yield primary, replica
+    app.dependency_overrides.clear()
+    primary.dispose()
+    replica.dispose()
+
+
+@pytest.fixture
+def headers(monkeypatch):
+    pem, jwk = make_signing_key("test-key")
+
+    async def fake_fetch_jwks():
+        return {"keys": [jwk]}
+
+    # Bộ khóa và cache token riêng cho test này, trả lại nguyên trạng khi xong
+    monkeypatch.setattr(jwt_handler, "fetch_jwks", fake_fetch_jwks)
+    monkeypatch.setattr(jwt_handler, "_signing_keys", {})
+    monkeypatch.setattr(jwt_handler, "_jwks_cache", None)
+    monkeypatch.setattr(jwt_handler, "_fetched_at", 0.0)
+    monkeypatch.setattr(jwt_handler, "_token_cache", LRUCache(100))
+
+    def for_user(name: str):
+        token = jwt.encode({"sub": f"{name}-{time.time()}", "preferred_username": name,
+                            "exp": int(time.time()) + 3600, "realm_access": {"roles": ["user"]}},
+                           pem, algorithm="RS256", headers={"kid": "test-key"})
+        return {"Authorization": f"Bearer {token}"}
+
+    return for_user
+
+
+def quantity(response) -> int:
+    assert response.status_code == 200, response.text
+    return response.json()["items"][0]["quantity"]
+
+
+def test_stale_replica_read_is_not_shared_after_write(databases, headers, monkeypatch):
+    primary, replica = databases
+    writer, reader = headers("writer"), headers("reader")
+    with TestClient(app) as client:
+        assert quantity(client.get(BOOKS, headers=reader)) == 5
+        assert client.post("/user/borrows/borrow/1", headers=writer).status_code == 200
+
+        # reader chưa ghi gì: đọc replica còn trễ (5), nhưng bản đó không được vào cache dùng chung
+        assert quantity(client.get(BOOKS, headers=reader)) == 5
+        # writer bị ghim vào primary: luôn thấy lượt mượn của chính mình
+        assert quantity(client.get(BOOKS, headers=writer)) == 4
+        assert quantity(client.get(BOOKS, headers=writer)) == 4
+
+        # Replica đã bắt kịp và đã qua cửa sổ read-your-writes: đọc từ replica lại được cache
+        with replica.begin() as conn:
+            conn.execute(update(models.Book).values(quantity=4))
+        monkeypatch.setattr(catalog_cache.settings, "READ_YOUR_WRITES_SECONDS", 0)
+        assert quantity(client.get(BOOKS, headers=reader)) == 4
+        with QueryCounter(primary, replica, database.async_engine, database.async_replica_engine) as counter:
+            assert quantity(client.get(BOOKS, headers=reader)) == 4
+        assert counter.count == 0
\ No newline at end of file
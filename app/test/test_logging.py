@@ -0,0 +1,49 @@
+# test_logging.py
+# Log chạy qua hàng đợi: request id được chốt ở thread gọi log, bản ghi ra là một dòng JSON.
+#
+# Chạy: pytest app/test/test_logging.py
+import json
+import logging
+import os
+import queue
+
+for name, value in {"KEYCLOAK_URL": "http://keycloak.invalid", "KEYCLOAK_REALM": "test",
+                    "KEYCLOAK_CLIENT_ID": "test", "KEYCLOAK_CLIENT_SECRET": "test",
+                    "DATABASE_URL": "sqlite://", "OVERDUE_SWEEP_ENABLED": "false"}.items():
+    os.environ.setdefault(name, value)
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.log import ContextQueueHandler, JsonFormatter, request_id
+
+
+def test_record_is_json_with_request_id_and_extras():
+    records = queue.SimpleQueue()
+    logger = logging.getLogger("test_logging")
+    logger.handlers[:] = [ContextQueueHandler(records)]
+    logger.propagate = False
+
+    token = request_id.set("req-1")
+    try:
+        logger.warning("Book %s deleted", 7, extra={"book_id": 7})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("failed")
+    finally:
+        request_id.reset(token)
+
+    line = json.loads(JsonFormatter().format(records.get_nowait()))
+    assert line["message"] == "Book 7 deleted"
+    assert line["request_id"] == "req-1"
+    assert line["book_id"] == 7 and line["level"] == "WARNING"
+    failed = json.loads(JsonFormatter().format(records.get_nowait()))
+    assert "ValueError: boom" in failed["exc"]
+
+
+def test_request_id_header():
+    with TestClient(app) as client:
+        assert client.get("/", headers={"X-Request-ID": "abc-123"}).headers["X-Request-ID"] == "abc-123"
+        generated = client.get("/", headers={"X-Request-ID": "bad id\n"}).headers["X-Request-ID"]
+        assert generated != "bad id\n" and len(generated) == 32
\ No newline at end of file
@@ -0,0 +1,177 @@
+# test_query_counts.py
+# Các endpoint danh sách phải chạy số câu SQL cố định, không tăng theo số dòng trả về:
+# gọi mỗi endpoint với ít và nhiều dữ liệu, khẳng định số câu truy vấn không vượt ngân sách và bằng nhau.
+#
+# Chạy: pytest app/test/test_query_counts.py
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+for name, value in {"KEYCLOAK_URL": "http://keycloak.invalid", "KEYCLOAK_REALM": "test",
+                    "KEYCLOAK_CLIENT_ID": "test", "KEYCLOAK_CLIENT_SECRET": "test",
+                    "DATABASE_URL": "sqlite://", "OVERDUE_SWEEP_ENABLED": "false"}.items():
+    os.environ.setdefault(name, value)
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import dependencies, models
+from app.auth import jwt_handler
+from app.config import settings
+from app.database import Base
+from app.main import app
+from app.models.borrow import BorrowStatus
+from app.test.bench_token_cache import make_signing_key
+from app.test.query_count import QueryCounter, assert_max_queries
+from app.utils.catalog_cache import bump_catalog_version
+from app.utils.query_stats import QueryStats, current_query_stats, instrument_engine
+
+SMALL, LARGE = 3, 200
+
+# Số câu SQL tối đa mỗi request (principal đã nằm trong cache)
+BUDGETS = {
+    "/user/books/?size=100": 3,            # COUNT + trang sách + tác giả phụ
+    "/user/books/cursor?size=100": 2,
+    "/admin/books/?size=100": 3,
+    "/user/borrows/current": 2,            # lượt mượn + sách/tác giả chính/thể loại (join) + tác giả phụ
+    "/user/borrows/history": 2,
+    "/user/borrows/history/cursor?size=100": 2,
+}
+
+
+def seed(engine, size: int):
+    now = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Role), [{"name": "admin"}, {"name": "user"}])
+        conn.execute(insert(models.User), [{"username": "reader", "hashed_password": "", "is_active": 1, "role_id": 2}])
+        conn.execute(insert(models.Category), [{"name": f"Category {i}"} for i in range(5)])
+        conn.execute(insert(models.Author), [{"name": f"Author {i}"} for i in range(size * 2)])
+        conn.execute(insert(models.Book), [
+            {"title": f"Book {i}", "main_author_id": i + 1, "quantity": 5, "category_id": i % 5 + 1,
+             "created_at": now, "updated_at": now}
+            for i in range(size)
+        ])
+        conn.execute(insert(models.BookAuthor), [
+            {"book_id": i + 1, "author_id": size + i + 1} for i in range(size)
+        ])
+        conn.execute(insert(models.Borrow), [
+            {"user_id": 1, "book_id": i + 1, "borrow_date": now + timedelta(days=i), "due_date": now + timedelta(days=i + 14),
+             "return_date": None if i % 2 else now + timedelta(days=i + 3),
+             "status": BorrowStatus.borrowing if i % 2 else BorrowStatus.returned,
+             "active": True if i % 2 else None}
+            for i in range(size)
+        ])
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    pem, jwk = make_signing_key("test-key")
+
+    async def fake_fetch_jwks():
+        return {"keys": [jwk]}
+
+    original = jwt_handler.fetch_jwks
+    jwt_handler.fetch_jwks = fake_fetch_jwks
+    yield pem
+    jwt_handler.fetch_jwks = original
+
+
+# App với database SQLite riêng có size sách/lượt mượn; mọi dependency session trỏ vào engine của test
+@pytest.fixture(params=[SMALL, LARGE], ids=["small", "large"])
+def client(request, signing_key):
+    path = os.path.join(tempfile.mkdtemp(), "query_counts.db")
+    engine = create_engine(f"sqlite:///{path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    Base.metadata.create_all(engine)
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+    seed(engine, request.param)
+    bump_catalog_version()  # Database mới bên dưới: bỏ các response catalog đã cache từ database trước
+
+    Session = sessionmaker(engine, autoflush=False)
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+    def get_db():
+        with Session() as db:
+            yield db
+
+    async def get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides.update({
+        dependencies.get_db: get_db, dependencies.get_read_db: get_db,
+        dependencies.get_async_db: get_async_db, dependencies.get_async_read_db: get_async_db,
+    })
+    token = jwt.encode({"sub": f"reader-{request.param}", "preferred_username": "reader",
+                        "exp": int(time.time()) + 3600, "realm_access": {"roles": ["user", "admin"]}},
+                       signing_key, algorithm="RS256", headers={"kid": "test-key"})
+    with TestClient(app, headers={"Authorization": f"Bearer {token}"}) as test_client:
+        test_client.get("/user/books/?size=1")  # Nạp principal vào cache trước khi đếm
+        test_client.engines = (engine, async_engine)
+        test_client.size = request.param
+        yield test_client
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+
+def count_queries(client, path: str) -> int:
+    with QueryCounter(*client.engines) as counter:
+        response = client.get(path)
+    assert response.status_code == 200, response.text
+    return counter.count
+
+
+@pytest.mark.parametrize("path", BUDGETS)
+def test_endpoint_query_budget(client, path):
+    with assert_max_queries(BUDGETS[path], *client.engines):
+        response = client.get(path)
+    assert response.status_code == 200, response.text
+    items = response.json()
+    items = items["items"] if isinstance(items, dict) else items
+    assert len(items) >= min(client.size // 2, 100)
+
+
+def test_borrow_history_is_not_n_plus_one(client):
+    # Cùng một số câu SQL cho 3 hay 200 lượt mượn
+    counts = {count_queries(client, "/user/borrows/history") for _ in range(2)}
+    assert counts == {BUDGETS["/user/borrows/history"]}
+
+
+def test_debug_headers_match_counter(client, monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG", True)
+    with QueryCounter(*client.engines) as counter:
+        response = client.get("/user/borrows/history")
+    assert int(response.headers["X-DB-Query-Count"]) == counter.count
+    assert float(response.headers["X-DB-Time-Ms"]) >= float(response.headers["X-DB-Slowest-Ms"]) > 0
+
+
+def test_catalog_revalidation_skips_database(client):
+    path = "/user/books/?size=100"
+    etag = client.get(path).headers["ETag"]
+    with assert_max_queries(0, *client.engines):
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+        assert client.get(path).headers["ETag"] == etag
+
+
+def test_failed_statement_leaves_no_timing_state(client):
+    engine = client.engines[0]
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        with engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(IntegrityError):
+                    conn.execute(text("INSERT INTO roles (id, name) VALUES (1, 'dup')"))
+                conn.rollback()
+            conn.execute(text("SELECT 1"))
+            assert not any(isinstance(value, list) for value in conn.info.values())
+    finally:
+        current_query_stats.reset(token)
+    assert stats.count == 1 and stats.slowest_statement == "SELECT 1"
\ No newline at end of file
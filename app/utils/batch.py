@@ -0,0 +1,55 @@
+from fastapi import HTTPException
+from sqlalchemy import select
+
+# Số id tối đa liệt kê trong thông báo lỗi
+MAX_LISTED_IDS = 20
+
+
+def chunked(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# Bỏ id trùng, giữ thứ tự gửi lên
+def unique_ids(ids) -> list:
+    return list(dict.fromkeys(ids))
+
+
+# Các giá trị của column có trong ids (một câu SELECT ... IN cho cả lô)
+def _existing_query(column, ids):
+    return select(column).where(column.in_(ids)).distinct()
+
+
+def existing_ids(db, column, ids) -> list:
+    return db.scalars(_existing_query(column, ids)).all()
+
+
+async def existing_ids_async(db, column, ids) -> list:
+    return (await db.scalars(_existing_query(column, ids))).all()
+
+
+def _format_ids(ids) -> str:
+    listed = ", ".join(map(str, ids[:MAX_LISTED_IDS]))
+    return listed + (f" (+{len(ids) - MAX_LISTED_IDS} more)" if len(ids) > MAX_LISTED_IDS else "")
+
+
+# Thao tác hàng loạt là tất cả hoặc không: một id không tồn tại thì từ chối cả lô
+def require_all_found(requested, found, label: str):
+    found = set(found)
+    missing = [item_id for item_id in requested if item_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"{label} not found: {_format_ids(missing)}")
+
+
+def reject_duplicates(ids, label: str):
+    seen, duplicates = set(), []
+    for item_id in ids:
+        if item_id in seen:
+            duplicates.append(item_id)
+        seen.add(item_id)
+    if duplicates:
+        raise HTTPException(status_code=400, detail=f"Duplicate {label} ids: {_format_ids(unique_ids(duplicates))}")
+
+
+def conflict(detail: str, ids) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"{detail}: {_format_ids(unique_ids(ids))}")
\ No newline at end of file
@@ -0,0 +1,297 @@
+import csv
+import io
+import json
+import os
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import ReadSessionLocal
+from app.schemas.book import BookImportRow
+from app.utils.batch import chunked
+from app.utils.catalog_cache import bump_catalog_version
+from app.utils.search import refresh_book_documents
+
+IMPORT_CHUNK_SIZE = 1000
+# Số dòng tối đa trong một câu INSERT nhiều dòng (giới hạn số tham số của SQLite)
+INSERT_MAX_ROWS = 1000
+EXPORT_CHUNK_SIZE = 1000
+# Chỉ giữ chi tiết của chừng này lỗi trong kết quả; "failed" vẫn đếm đủ
+MAX_REPORTED_ERRORS = 1000
+CSV_FIELDS = ["id", "title", "main_author", "authors", "description", "quantity", "category"]
+AUTHOR_SEPARATOR = ";"
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def detect_format(filename: str):
+    return FORMATS.get(os.path.splitext(filename or "")[1].lower())
+
+
+# So khớp tên tác giả/thể loại không phân biệt hoa thường và khoảng trắng thừa
+def _name_key(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+# Đọc từng bản ghi CSV từ một iterable các dòng, trả về (số dòng, dict hoặc lỗi)
+def read_csv_rows(lines):
+    reader = csv.DictReader(lines)
+    for record in reader:
+        if None in record:
+            yield reader.line_num, ValueError("too many fields")
+            continue
+        record = {key: value for key, value in record.items() if value not in ("", None)}
+        if "authors" in record:
+            record["authors"] = [name.strip() for name in record["authors"].split(AUTHOR_SEPARATOR) if name.strip()]
+        yield reader.line_num, record
+
+
+def read_ndjson_rows(lines):
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_no, ValueError(f"invalid JSON: {exc.msg}")
+
+
+def read_rows(lines, fmt: str):
+    return read_csv_rows(lines) if fmt == "csv" else read_ndjson_rows(lines)
+
+
+# Cột dùng để nhận lại dòng vừa chèn khi không lấy được id trực tiếp (xem _insert_and_select_ids)
+NATURAL_KEYS = {
+    models.Author: ("name",),
+    models.Book: ("title", "main_author_id", "category_id", "quantity", "description"),
+}
+
+
+# Chèn một lô và lấy id theo đúng thứ tự các dòng. Mỗi câu là một INSERT nhiều dòng (tối đa INSERT_MAX_ROWS dòng);
+# trong một câu, id tự tăng luôn tăng theo thứ tự dòng nên:
+# - SQLite/MariaDB: INSERT ... RETURNING rồi sắp xếp id (thứ tự dòng RETURNING không được bảo đảm).
+#   Không dùng executemany + sort_by_parameter_order: với khóa autoincrement SQLAlchemy lùi về một câu mỗi dòng;
+# - MySQL với innodb_autoinc_lock_mode <= 1: dải id liên tiếp tính từ lastrowid;
+# - còn lại (MySQL mặc định lock mode 2): đọc lại các dòng vừa chèn theo khóa tự nhiên.
+def _insert_returning_ids(conn, model, rows: list) -> list:
+    ids = []
+    for chunk in chunked(rows, INSERT_MAX_ROWS):
+        if conn.dialect.insert_returning:
+            ids.extend(sorted(conn.execute(insert(model).values(chunk).returning(model.id)).scalars()))
+        elif _autoinc_ids_are_consecutive(conn):
+            first_id = conn.execute(insert(model).values(chunk)).lastrowid  # LAST_INSERT_ID(): id của dòng đầu tiên
+            ids.extend(range(first_id, first_id + len(chunk)))
+        else:
+            ids.extend(_insert_and_select_ids(conn, model, chunk))
+    return ids
+
+
+# Lock mode 0/1 cấp cho một câu INSERT nhiều dòng (số dòng biết trước) một dải id liền nhau; mode 2 thì không
+def _autoinc_ids_are_consecutive(conn) -> bool:
+    if conn.dialect.name != "mysql":
+        return False
+    if "autoinc_lock_mode" not in conn.info:
+        conn.info["autoinc_lock_mode"] = conn.execute(text("SELECT @@innodb_autoinc_lock_mode")).scalar()
+    return int(conn.info["autoinc_lock_mode"]) <= 1
+
+
+# Chèn cả lô bằng một câu rồi đọc lại các dòng có id lớn hơn id lớn nhất trước đó, khớp với từng dòng đã chèn
+# theo khóa tự nhiên. Id trong một câu INSERT luôn tăng theo thứ tự dòng, nên các dòng trùng khóa
+# (cùng tên sách, cùng tác giả...) được ghép theo thứ tự id.
+def _insert_and_select_ids(conn, model, rows: list) -> list:
+    columns = [getattr(model, name) for name in NATURAL_KEYS[model]]
+    max_before = conn.execute(select(func.max(model.id))).scalar() or 0
+    conn.execute(insert(model).values(rows))
+
+    waiting = defaultdict(deque)
+    for index, row in enumerate(rows):
+        waiting[tuple(row.get(name) for name in NATURAL_KEYS[model])].append(index)
+    ids = [None] * len(rows)
+    for row_id, *key in conn.execute(select(model.id, *columns).where(model.id > max_before).order_by(model.id)):
+        indexes = waiting.get(tuple(key))
+        if indexes:
+            ids[indexes.popleft()] = row_id
+    if None in ids:
+        raise RuntimeError(f"could not read back ids of inserted {model.__tablename__} rows")
+    return ids
+
+
+class BookImporter:
+    """Nhập sách theo lô trong transaction của db; gọi finish() để ghi lô cuối và commit.
+
+    Tác giả và thể loại được tra theo tên qua map trong bộ nhớ (nạp một lần). Tác giả chưa có được tạo mới
+    nếu create_authors, thể loại chưa có là lỗi của dòng đó. Dòng lỗi bị bỏ qua, các dòng khác vẫn được nhập.
+    """
+
+    def __init__(self, db: Session, create_authors: bool = True, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.db = db
+        self.conn = db.connection()
+        self.create_authors = create_authors
+        self.chunk_size = chunk_size
+        self.authors = {_name_key(name): author_id
+                        for author_id, name in self.conn.execute(select(models.Author.id, models.Author.name))}
+        self.categories = {_name_key(name): category_id
+                           for category_id, name in self.conn.execute(select(models.Category.id, models.Category.name))}
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self._pending = []
+
+    def _error(self, line: int, error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def add(self, line: int, record):
+        if isinstance(record, Exception):
+            self._error(line, str(record))
+            return
+        try:
+            row = BookImportRow.model_validate(record)
+        except ValidationError as exc:
+            self._error(line, "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in exc.errors()))
+            return
+
+        category_id = self.categories.get(_name_key(row.category))
+        if category_id is None:
+            self._error(line, f"category not found: {row.category}")
+            return
+        self._pending.append((line, row, category_id))
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def _resolve_authors(self, pending: list) -> list:
+        names = {}
+        for _, row, _ in pending:
+            for name in (row.main_author, *row.authors):
+                if _name_key(name) not in self.authors:
+                    names.setdefault(_name_key(name), " ".join(name.split()))
+        if not names:
+            return pending
+
+        if self.create_authors:
+            now = datetime.now(timezone.utc)
+            ids = _insert_returning_ids(self.conn, models.Author, [
+                {"name": name, "created_at": now, "updated_at": now} for name in names.values()
+            ])
+            self.authors.update(zip(names.keys(), ids))
+            return pending
+
+        resolved = []
+        for line, row, category_id in pending:
+            missing = [name for name in (row.main_author, *row.authors) if _name_key(name) in names]
+            if missing:
+                self._error(line, f"author not found: {', '.join(missing)}")
+            else:
+                resolved.append((line, row, category_id))
+        return resolved
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        pending = self._resolve_authors(pending)
+        if not pending:
+            return
+
+        now = datetime.now(timezone.utc)
+        book_ids = _insert_returning_ids(self.conn, models.Book, [
+            {
+                "title": row.title,
+                "main_author_id": self.authors[_name_key(row.main_author)],
+                "description": row.description,
+                "quantity": row.quantity,
+                "category_id": category_id,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for _, row, category_id in pending
+        ])
+
+        links = set()
+        for book_id, (_, row, _) in zip(book_ids, pending):
+            main_author_id = self.authors[_name_key(row.main_author)]
+            links.update((book_id, self.authors[_name_key(name)]) for name in row.authors
+                         if self.authors[_name_key(name)] != main_author_id)
+        if links:
+            self.conn.execute(insert(models.BookAuthor),
+                              [{"book_id": book_id, "author_id": author_id} for book_id, author_id in links])
+
+        # Chèn bằng core không qua event after_flush của ORM: tự cập nhật chỉ mục tìm kiếm
+        refresh_book_documents(self.conn, book_ids)
+        self.imported += len(book_ids)
+
+    def finish(self) -> dict:
+        self.flush()
+        self.db.commit()
+        if self.imported:
+            bump_catalog_version()  # Ghi qua connection (core) nên event của session không thấy
+        self.errors.sort(key=lambda error: error["line"])
+        return {"imported": self.imported, "failed": self.failed, "errors": self.errors}
+
+
+def import_books(db: Session, rows, create_authors: bool = True) -> dict:
+    importer = BookImporter(db, create_authors)
+    for line, record in rows:
+        importer.add(line, record)
+    return importer.finish()
+
+
+# Duyệt toàn bộ danh mục theo từng lô id tăng dần (keyset), không nạp hết vào bộ nhớ
+def iter_book_records(db: Session, chunk_size: int = EXPORT_CHUNK_SIZE):
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(models.Book.id, models.Book.title, models.Author.name, models.Book.description,
+                   models.Book.quantity, models.Category.name)
+            .outerjoin(models.Author, models.Author.id == models.Book.main_author_id)
+            .outerjoin(models.Category, models.Category.id == models.Book.category_id)
+            .where(models.Book.id > last_id)
+            .order_by(models.Book.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+
+        co_authors = {}
+        for book_id, name in db.execute(
+            select(models.BookAuthor.book_id, models.Author.name)
+            .join(models.Author, models.Author.id == models.BookAuthor.author_id)
+            .where(models.BookAuthor.book_id.in_([row[0] for row in rows]))
+            .order_by(models.BookAuthor.book_id, models.Author.id)
+        ):
+            co_authors.setdefault(book_id, []).append(name)
+
+        for book_id, title, main_author, description, quantity, category in rows:
+            yield {"id": book_id, "title": title, "main_author": main_author,
+                   "authors": co_authors.get(book_id, []), "description": description,
+                   "quantity": quantity, "category": category}
+        last_id = rows[-1][0]
+
+
+# Ghép bản ghi thành các khối văn bản cỡ vừa phải để ghi ra file hoặc gửi qua StreamingResponse
+def write_records(records, fmt: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, CSV_FIELDS) if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+    for count, record in enumerate(records, 1):
+        if writer:
+            writer.writerow({**record, "authors": f"{AUTHOR_SEPARATOR} ".join(record["authors"])})
+        else:
+            buffer.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+# Generator cho StreamingResponse: tự mở session riêng (session của dependency đã đóng khi response bắt đầu gửi)
+def stream_export(fmt: str):
+    db = ReadSessionLocal()
+    try:
+        yield from write_records(iter_book_records(db), fmt)
+    finally:
+        db.close()
\ No newline at end of file
@@ -0,0 +1,70 @@
+from pydantic import TypeAdapter
+from sqlalchemy import or_, select
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+
+from app import models
+from app.schemas.book import BookResponse
+from app.utils.search import apply_book_search
+
+BOOK_ORDER_COLUMNS = {
+    "id": models.Book.id,
+    "title": models.Book.title
+}
+
+
+# Nạp sẵn mọi quan hệ mà BookResponse cần; bắt buộc với AsyncSession vì không thể lazy load.
+# main_author và category là many-to-one nên join được mà không nhân bản dòng,
+# còn tác giả phụ nạp bằng một câu SELECT ... IN riêng cho đúng các sách của trang.
+# Dùng chung cho danh sách sách và sách lồng trong lượt mượn (joinedload(Borrow.book).options(...)).
+# Quan hệ khác của sách bị raiseload: lỡ truy cập thì báo lỗi ngay thay vì âm thầm chạy N+1 câu SELECT
+def book_load_options():
+    return (joinedload(models.Book.main_author),
+            joinedload(models.Book.category),
+            selectinload(models.Book.authors),
+            raiseload("*"))
+
+
+# Dựng câu SELECT cho danh sách sách (lọc + sắp xếp), chưa thực thi
+def build_book_query(title: str = None, author: str = None, category: str = None,
+                     order_by: str = None, sort: str = "asc", q: str = None, dialect: str = "mysql"):
+    query = select(models.Book).options(*book_load_options())
+
+    relevance = None
+    if q:
+        query, relevance = apply_book_search(query, q, dialect)
+
+    if title:
+        query = query.where(models.Book.title.ilike(f"%{title}%"))
+    if author:
+        subquery = select(models.BookAuthor.book_id)\
+                    .join(models.Author)\
+                    .where(models.Author.name.ilike(f"%{author}%"))
+        query = query.where(
+            or_(
+                models.Book.main_author.has(models.Author.name.ilike(f"%{author}%")),
+                models.Book.id.in_(subquery)
+            )
+        )
+    if category:
+        query = query.where(models.Book.category.has(models.Category.name.ilike(f"%{category}%")))
+
+    # Mặc định xếp theo độ liên quan khi có tìm kiếm toàn văn, ngược lại theo id
+    if order_by is None:
+        order_by = "relevance" if relevance is not None else "id"
+    if order_by == "relevance":
+        if relevance is None:
+            return query.order_by(models.Book.id.asc())
+        return query.order_by(relevance, models.Book.id.asc())
+
+    order_column = BOOK_ORDER_COLUMNS.get(order_by, models.Book.id)
+    if sort == "desc":
+        return query.order_by(order_column.desc(), models.Book.id.desc())
+    return query.order_by(order_column.asc(), models.Book.id.asc())
+
+
+_book_list = TypeAdapter(list[BookResponse])
+
+
+# ORM -> BookResponse cho cả trang trong một lần validate (from_attributes), không dựng từng object bằng tay
+def books_to_response(books):
+    return _book_list.validate_python(books, from_attributes=True)
\ No newline at end of file
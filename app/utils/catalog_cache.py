@@ -0,0 +1,133 @@
+import hashlib
+import threading
+import time
+from typing import Optional
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.responses import Response
+
+from app import models
+from app.config import settings
+from app.database import current_user_id, is_pinned_to_primary, reads_from_replica
+from app.utils.cache import LRUCache
+
+# Bảng thuộc catalog: ghi vào các bảng này (qua session) làm tăng phiên bản catalog
+CATALOG_MODELS = (models.Book, models.Author, models.Category, models.BookAuthor)
+# Trình duyệt luôn hỏi lại server (If-None-Match) trước khi dùng bản đã lưu; private vì cần đăng nhập
+CACHE_CONTROL = "private, no-cache"
+
+# Phiên bản catalog của process này, tăng sau mỗi commit có ghi vào catalog.
+# Mỗi worker có bộ đếm và cache riêng: ghi ở worker khác chỉ thấy được sau CATALOG_CACHE_TTL giây.
+_version = 0
+_bumped_at = float("-inf")  # time.monotonic() của lần tăng phiên bản gần nhất
+_version_lock = threading.Lock()
+# (phiên bản, path, query đã chuẩn hoá) -> (ETag, body JSON)
+_responses = LRUCache(settings.CATALOG_CACHE_SIZE, ttl=settings.CATALOG_CACHE_TTL)
+
+
+def catalog_version() -> int:
+    return _version
+
+
+def bump_catalog_version():
+    global _version, _bumped_at
+    with _version_lock:
+        _version += 1
+        _bumped_at = time.monotonic()
+    _responses.clear()
+
+
+# User vừa ghi đọc thẳng từ primary (read-your-writes): không đọc cũng không ghi vào cache dùng chung
+def _bypasses_shared_cache() -> bool:
+    return is_pinned_to_primary(current_user_id.get())
+
+
+# Kết quả đọc từ replica ngay sau một lần ghi có thể còn là dữ liệu cũ: chỉ đưa vào cache dùng chung
+# khi đã qua READ_YOUR_WRITES_SECONDS kể từ lần tăng phiên bản, hoặc khi đọc từ primary
+def _may_store(db) -> bool:
+    if _bypasses_shared_cache():
+        return False
+    return not reads_from_replica(db) or time.monotonic() - _bumped_at >= settings.READ_YOUR_WRITES_SECONDS
+
+
+# Khóa cache: phiên bản hiện tại + path + query string đã sắp xếp, bỏ tham số rỗng.
+# Lấy phiên bản lúc bắt đầu request: kết quả tính xong sau một lần ghi sẽ nằm dưới khóa cũ, không bao giờ được đọc.
+def catalog_cache_key(request: Request) -> tuple:
+    params = tuple(sorted((name, value) for name, value in request.query_params.multi_items() if value != ""))
+    return catalog_version(), request.url.path, params
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+# If-None-Match so sánh yếu (RFC 9110): bỏ tiền tố W/, chấp nhận danh sách và "*"
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _respond(request: Request, etag: str, body: bytes) -> Response:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=JSONResponse.media_type, headers=headers)
+
+
+# Bản đã cache của request này (200 hoặc 304), None nếu chưa có
+def cached_catalog_response(request: Request, key: tuple) -> Optional[Response]:
+    if _bypasses_shared_cache():
+        return None
+    entry = _responses.get(key)
+    if entry is None:
+        return None
+    return _respond(request, *entry)
+
+
+# Serialize kết quả của endpoint (đọc bằng session db), lưu dưới khóa đã lấy lúc bắt đầu request và trả về kèm ETag
+def catalog_response(request: Request, key: tuple, content, db) -> Response:
+    if isinstance(content, BaseModel):
+        body = content.model_dump_json(by_alias=True).encode()
+    else:
+        body = JSONResponse(jsonable_encoder(content)).body
+    etag = make_etag(body)
+    if _may_store(db):
+        _responses.set(key, (etag, body))
+    return _respond(request, etag, body)
+
+
+# Đánh dấu session đã ghi vào catalog: qua flush của ORM hoặc câu UPDATE/DELETE/INSERT hàng loạt qua session.
+# Thao tác core trên connection (import sách, seed) phải tự gọi bump_catalog_version().
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session, flush_context):
+    if any(isinstance(obj, CATALOG_MODELS) for objects in (session.new, session.dirty, session.deleted)
+           for obj in objects):
+        session.info["catalog_changed"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk(orm_execute_state):
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in CATALOG_MODELS:
+        orm_execute_state.session.info["catalog_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    if session.info.pop("catalog_changed", False):
+        bump_catalog_version()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_on_rollback(session):
+    session.info.pop("catalog_changed", None)
\ No newline at end of file
@@ -1,6 +1,14 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
+
+from app.config import settings
 from app.models.user import User
+from app.utils.metrics import HASH_SECONDS
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -14,4 +22,61 @@ def authenticate_user(db: Session, username: str, password: str):
     user = db.query(User).filter(User.username == username).first()
     if user and verify_password(password, user.hashed_password):
         return user
-    return None
\ No newline at end of file
+    return None
+
+
+# bcrypt tốn ~250ms CPU mỗi lần và nhả GIL khi chạy, nên đẩy sang thread pool riêng
+# để không chặn event loop. Semaphore giới hạn số việc chạy cùng lúc, còn hàng đợi phía trước
+# bị chặn ở HASH_MAX_QUEUE: vượt quá thì trả 503 thay vì để request treo vô hạn.
+_executor = ThreadPoolExecutor(max_workers=settings.HASH_WORKERS, thread_name_prefix="bcrypt")
+_semaphore = asyncio.Semaphore(settings.HASH_WORKERS)
+_stats_lock = threading.Lock()
+_stats = {"waiting": 0, "in_flight": 0, "completed": 0, "rejected": 0, "max_waiting": 0}
+
+
+def _update_stats(**changes):
+    with _stats_lock:
+        for key, delta in changes.items():
+            _stats[key] += delta
+
+
+# Số liệu hàng đợi hashing, dùng cho /health/hashing
+def hashing_stats() -> dict:
+    with _stats_lock:
+        return {**_stats, "workers": settings.HASH_WORKERS, "max_queue": settings.HASH_MAX_QUEUE}
+
+
+async def _run_in_pool(operation: str, func, *args):
+    with _stats_lock:
+        if _stats["waiting"] >= settings.HASH_MAX_QUEUE:
+            _stats["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again later"
+            )
+        _stats["waiting"] += 1
+        _stats["max_waiting"] = max(_stats["max_waiting"], _stats["waiting"])
+    try:
+        await _semaphore.acquire()
+    finally:
+        _update_stats(waiting=-1)
+    _update_stats(in_flight=1)
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    finally:
+        HASH_SECONDS.labels(operation).observe(time.perf_counter() - start)
+        _semaphore.release()
+        _update_stats(in_flight=-1, completed=1)
+
+
+async def hash_password_async(password: str):
+    return await _run_in_pool("hash", hash_password, password)
+
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_in_pool("verify", verify_password, plain_password, hashed_password)
+
+
+def shutdown_hashing():
+    _executor.shutdown(wait=False, cancel_futures=True)
\ No newline at end of file
@@ -0,0 +1,117 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from app.config import settings
+
+# id của request hiện tại, do RequestIdMiddleware gán; None ngoài request (job nền, CLI)
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Chỉ nhận X-Request-ID từ client khi đủ ngắn và không chứa ký tự lạ
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+# Thuộc tính có sẵn của LogRecord (và bản tô màu của uvicorn); phần còn lại là trường truyền qua extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "color_message"}
+TEXT_FORMAT = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Mỗi bản ghi một dòng JSON: ts, level, logger, message, request_id và các trường extra."""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        payload.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class ContextQueueHandler(QueueHandler):
+    """Đẩy bản ghi vào hàng đợi; việc format và ghi ra stdout do thread của QueueListener làm.
+
+    Những gì phụ thuộc ngữ cảnh (request id, message đã ghép args, traceback) được chốt ngay ở
+    thread gọi log, vì thread ghi log không thấy contextvar của request.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = request_id.get()
+        return record
+
+
+# Cấu hình logging cho cả process: root và các logger của uvicorn đi qua hàng đợi, một thread nền ghi ra stdout
+def setup_logging():
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers[:] = [ContextQueueHandler(log_queue)]
+    root.setLevel(settings.LOG_LEVEL)
+    # uvicorn tự gắn handler ghi thẳng stdout trước khi import app: chuyển về root để dùng chung hàng đợi
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+
+def _request_id_from(scope) -> str:
+    for name, value in scope["headers"]:
+        if name == b"x-request-id":
+            value = value.decode("latin-1")
+            if _REQUEST_ID_PATTERN.match(value):
+                return value
+            break
+    return uuid.uuid4().hex
+
+
+class RequestIdMiddleware:
+    """Middleware ASGI: lấy X-Request-ID của client (hoặc sinh mới), gắn vào mọi log của request và trả lại trong header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        current = _request_id_from(scope)
+        token = request_id.set(current)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", current.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id.reset(token)
\ No newline at end of file
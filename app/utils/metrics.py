@@ -0,0 +1,85 @@
+import os
+import time
+
+# prometheus-client 0.9 chỉ đọc biến viết thường prometheus_multiproc_dir, và đọc ngay khi import:
+# nhận cả tên viết hoa (tên mới của các bản sau) trước khi import prometheus_client
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ.setdefault("prometheus_multiproc_dir", os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from starlette.responses import Response
+
+# Chế độ nhiều process (uvicorn --workers): mỗi worker ghi số liệu ra file mmap trong thư mục này,
+# /metrics gộp file của mọi worker. Thư mục phải được làm trống trước khi khởi động các worker.
+MULTIPROCESS_DIR = os.environ.get("prometheus_multiproc_dir")
+
+# Ngưỡng (giây) cho các thao tác nhanh: xác minh token, phiên DB
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being processed",
+    multiprocess_mode="livesum",
+)
+TOKEN_VERIFY_SECONDS = Histogram(
+    "auth_verify_token_seconds", "Time spent in verify_token", ["cache"], buckets=FAST_BUCKETS,
+)
+JWKS_FETCH_SECONDS = Histogram("auth_jwks_fetch_seconds", "Time spent fetching JWKS from Keycloak")
+HASH_SECONDS = Histogram(
+    "bcrypt_seconds", "Time spent hashing/verifying passwords in the bcrypt pool", ["operation"],
+)
+DB_SESSION_SECONDS = Histogram(
+    "db_session_seconds", "Lifetime of request-scoped DB sessions", ["engine", "target"], buckets=FAST_BUCKETS,
+)
+BORROW_OPERATIONS = Counter("library_borrow_operations", "Borrow/return attempts by outcome", ["operation", "result"])
+LOGINS = Counter("auth_logins", "Password logins through Keycloak by outcome", ["result"])
+
+
+class MetricsMiddleware:
+    """Middleware ASGI đo thời gian mỗi request, gắn nhãn theo template của route (không theo path thật)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            route = scope.get("route")
+            # Path không khớp route nào gom chung một nhãn để số chuỗi thời gian không tăng theo URL lạ
+            REQUEST_LATENCY.labels(scope["method"], getattr(route, "path", "unmatched"), str(status)) \
+                .observe(time.perf_counter() - start)
+
+
+def metrics_response() -> Response:
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+# Gọi khi worker tắt: bỏ số liệu gauge "live" của process này khỏi kết quả gộp
+def mark_process_dead():
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(os.getpid())
\ No newline at end of file
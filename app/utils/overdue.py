@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from datetime import datetime
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.borrow import Borrow, BorrowStatus
+
+logger = logging.getLogger(__name__)
+
+
+# Đánh dấu quá hạn một lô: lấy id theo index (status, due_date) rồi UPDATE theo id trong transaction ngắn.
+# Chọn id trước thay vì UPDATE ... LIMIT vì SQLite không hỗ trợ, còn MySQL không cho LIMIT trong subquery IN.
+async def mark_overdue_batch(db, now: datetime, batch_size: int) -> int:
+    ids = (await db.scalars(
+        select(Borrow.id)
+        .where(Borrow.status == BorrowStatus.borrowing, Borrow.due_date < now)
+        .order_by(Borrow.due_date)
+        .limit(batch_size)
+    )).all()
+    if not ids:
+        return 0
+
+    result = await db.execute(
+        update(Borrow)
+        .where(Borrow.id.in_(ids), Borrow.status == BorrowStatus.borrowing)
+        .values(status=BorrowStatus.overdue)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def sweep_overdue(batch_size: int = None) -> int:
+    batch_size = batch_size or settings.OVERDUE_SWEEP_BATCH_SIZE
+    now = datetime.utcnow()
+    total = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            updated = await mark_overdue_batch(db, now, batch_size)
+            total += updated
+            if updated < batch_size:
+                return total
+            await asyncio.sleep(0)  # Nhường event loop giữa các lô
+
+
+# Chạy nền trong lifespan của app. Mỗi worker đều chạy nhưng UPDATE có điều kiện nên chạy trùng vô hại.
+async def run_overdue_sweeper():
+    while True:
+        try:
+            marked = await sweep_overdue()
+            if marked:
+                logger.info("Marked borrows as overdue", extra={"count": marked})
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Overdue sweep failed")
+        await asyncio.sleep(settings.OVERDUE_SWEEP_INTERVAL)
\ No newline at end of file
@@ -0,0 +1,102 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+CURSOR_DEFAULT_SIZE = 50
+CURSOR_MAX_SIZE = 100
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(order_by: str, sort: str, value, last_id: int) -> str:
+    raw = json.dumps({"o": order_by, "s": sort, "v": _encode_value(value), "id": last_id},
+                     separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: str, sort: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, last_id = _decode_value(data["v"]), int(data["id"])
+        cursor_order, cursor_sort = data["o"], data["s"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    # Cursor chỉ có nghĩa với đúng thứ tự đã sinh ra nó
+    if cursor_order != order_by or cursor_sort != sort:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor does not match the requested order_by/sort"
+        )
+    return value, last_id
+
+
+def _keyset_filter(order_column, id_column, sort: str, value, last_id: int):
+    # MySQL và SQLite xếp NULL lên đầu khi ASC và xuống cuối khi DESC
+    if order_column is id_column:
+        return id_column > last_id if sort == "asc" else id_column < last_id
+
+    if sort == "asc":
+        if value is None:
+            return or_(and_(order_column.is_(None), id_column > last_id), order_column.isnot(None))
+        return or_(order_column > value, and_(order_column == value, id_column > last_id))
+
+    if value is None:
+        return and_(order_column.is_(None), id_column < last_id)
+    return or_(order_column < value,
+               and_(order_column == value, id_column < last_id),
+               order_column.is_(None))
+
+
+def _keyset_query(query, order_column, id_column, order_by: str, sort: str, cursor: str, size: int):
+    if sort == "desc":
+        query = query.order_by(None).order_by(order_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(None).order_by(order_column.asc(), id_column.asc())
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, order_by, sort)
+        query = query.where(_keyset_filter(order_column, id_column, sort, value, last_id))
+    return query.limit(size + 1)
+
+
+def _keyset_page(rows, order_column, id_column, order_by: str, sort: str, size: int, transformer):
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        next_cursor = encode_cursor(order_by, sort,
+                                    getattr(last, order_column.key),
+                                    getattr(last, id_column.key))
+
+    items = transformer(rows) if transformer else rows
+    return {"items": items, "size": size, "next_cursor": next_cursor}
+
+
+# Phân trang theo keyset: WHERE (cột, id) đứng sau cursor, ORDER BY cột, id, LIMIT size + 1
+def keyset_paginate(db, query, order_column, id_column, order_by: str, sort: str,
+                    cursor: str = None, size: int = CURSOR_DEFAULT_SIZE, transformer=None):
+    query = _keyset_query(query, order_column, id_column, order_by, sort, cursor, size)
+    rows = db.execute(query).scalars().all()
+    return _keyset_page(rows, order_column, id_column, order_by, sort, size, transformer)
+
+
+# Như keyset_paginate nhưng với AsyncSession
+async def keyset_paginate_async(db, query, order_column, id_column, order_by: str, sort: str,
+                                cursor: str = None, size: int = CURSOR_DEFAULT_SIZE, transformer=None):
+    query = _keyset_query(query, order_column, id_column, order_by, sort, cursor, size)
+    rows = (await db.execute(query)).scalars().all()
+    return _keyset_page(rows, order_column, id_column, order_by, sort, size, transformer)
\ No newline at end of file
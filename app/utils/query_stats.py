@@ -0,0 +1,140 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.config import settings
+
+logger = logging.getLogger("app.sql")
+
+# Độ dài tối đa của câu SQL khi ghi log / đưa vào header
+MAX_STATEMENT_LENGTH = 1000
+# Tiền tố EXPLAIN theo dialect; dialect khác dùng "EXPLAIN "
+EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN ", "mysql": "EXPLAIN "}
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+class QueryStats:
+    """Số câu SQL, tổng thời gian DB và câu chậm nhất của một request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def observe(self, statement: str, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.slowest:
+            self.slowest = seconds
+            self.slowest_statement = statement
+
+    def headers(self) -> list:
+        return [
+            (b"x-db-query-count", str(self.count).encode()),
+            (b"x-db-time-ms", f"{self.total * 1000:.2f}".encode()),
+            (b"x-db-slowest-ms", f"{self.slowest * 1000:.2f}".encode()),
+        ]
+
+
+# Số liệu của request hiện tại, do QueryStatsMiddleware gán; None ngoài request (job nền, CLI)
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def _shorten(statement: str) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= MAX_STATEMENT_LENGTH else statement[:MAX_STATEMENT_LENGTH] + "..."
+
+
+# Chạy EXPLAIN bằng cursor DBAPI riêng trên cùng connection: không đi qua event của engine nên không đệ quy
+def explain(conn, statement: str, parameters) -> list:
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name, "EXPLAIN ")
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [list(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def _log_slow_query(conn, statement: str, parameters, seconds: float, executemany: bool):
+    fields = {"duration_ms": round(seconds * 1000, 2), "statement": _shorten(statement)}
+    if settings.SLOW_QUERY_EXPLAIN and not executemany \
+            and statement.lstrip().upper().startswith(EXPLAINABLE):
+        try:
+            fields["plan"] = explain(conn, statement, parameters)
+        except Exception as e:
+            fields["explain_error"] = str(e)
+    logger.warning("slow_query", extra=fields)
+
+
+# Thời điểm bắt đầu gắn vào execution context của chính câu lệnh: câu lỗi (after_cursor_execute không chạy)
+# không để lại gì trên connection của pool
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    seconds = time.perf_counter() - start
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.observe(statement, seconds)
+    if settings.SLOW_QUERY_THRESHOLD_MS and seconds * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        _log_slow_query(conn, statement, parameters, seconds, executemany)
+
+
+# Gắn bộ đếm vào engine sync (engine async: truyền async_engine.sync_engine)
+def instrument_engine(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """Middleware ASGI: đếm SQL của từng request, ghi một dòng log khi request xong.
+
+    Khi DEBUG bật, thêm các header X-DB-Query-Count / X-DB-Time-Ms / X-DB-Slowest-Ms.
+    Header chỉ tính các câu chạy trước khi gửi response; dòng log tính cả phần body streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        status = None
+
+        async def send_with_stats(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.DEBUG:
+                    message["headers"] = list(message.get("headers", [])) + stats.headers()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_query_stats.reset(token)
+            if stats.count:
+                logger.info("request_sql", extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "queries": stats.count,
+                    "db_ms": round(stats.total * 1000, 2),
+                    "slowest_ms": round(stats.slowest * 1000, 2),
+                    "slowest_statement": _shorten(stats.slowest_statement),
+                })
\ No newline at end of file
@@ -0,0 +1,181 @@
+import re
+import sys
+import unicodedata
+from sqlalchemy import bindparam, column, delete, event, insert, inspect, select, table, text
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+
+from app import models
+
+# innodb_ft_min_token_size mặc định của MySQL; từ ngắn hơn không có trong chỉ mục FULLTEXT
+MYSQL_MIN_TOKEN_SIZE = 3
+REFRESH_CHUNK_SIZE = 500
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_fts = table("book_search_fts", column("rowid"), column("rank"))
+
+
+# Bỏ dấu tiếng Việt và chuyển về chữ thường: "Hòn đá Phù thủy" -> "hon da phu thuy"
+def normalize_text(value: str) -> str:
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFD", value.replace("đ", "d").replace("Đ", "D"))
+    stripped = "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+    return stripped.casefold()
+
+
+def tokenize(value: str) -> list[str]:
+    return _TOKEN_RE.findall(normalize_text(value))
+
+
+def build_document(title: str, description: str, author_names) -> str:
+    parts = [title, description, *author_names]
+    return " ".join(" ".join(tokenize(part)) for part in parts if part)
+
+
+def _chunks(ids):
+    ids = sorted(ids)
+    for i in range(0, len(ids), REFRESH_CHUNK_SIZE):
+        yield ids[i:i + REFRESH_CHUNK_SIZE]
+
+
+# Tính lại tài liệu tìm kiếm cho các sách trong book_ids (chạy trong transaction hiện tại)
+def refresh_book_documents(conn, book_ids):
+    is_sqlite = conn.dialect.name == "sqlite"
+    for chunk in _chunks(book_ids):
+        rows = conn.execute(
+            select(models.Book.id, models.Book.title, models.Book.description, models.Author.name)
+            .outerjoin(models.Author, models.Author.id == models.Book.main_author_id)
+            .where(models.Book.id.in_(chunk))
+        ).all()
+        co_authors = {}
+        for book_id, name in conn.execute(
+            select(models.BookAuthor.book_id, models.Author.name)
+            .join(models.Author, models.Author.id == models.BookAuthor.author_id)
+            .where(models.BookAuthor.book_id.in_(chunk))
+        ):
+            co_authors.setdefault(book_id, []).append(name)
+
+        documents = [
+            {"book_id": book_id,
+             "document": build_document(title, description, [main_author, *co_authors.get(book_id, [])])}
+            for book_id, title, description, main_author in rows
+        ]
+
+        remove_book_documents(conn, chunk)
+        if documents:
+            conn.execute(insert(models.BookSearch), documents)
+            if is_sqlite:
+                conn.execute(
+                    text("INSERT INTO book_search_fts (rowid, document) VALUES (:book_id, :document)"),
+                    documents
+                )
+
+
+def remove_book_documents(conn, book_ids):
+    book_ids = list(book_ids)
+    if not book_ids:
+        return
+    conn.execute(delete(models.BookSearch).where(models.BookSearch.book_id.in_(book_ids)))
+    if conn.dialect.name == "sqlite":
+        conn.execute(
+            text("DELETE FROM book_search_fts WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": book_ids}
+        )
+
+
+def rebuild_search_index(db: Session):
+    conn = db.connection()
+    conn.execute(delete(models.BookSearch))
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("DELETE FROM book_search_fts"))
+    book_ids = db.execute(select(models.Book.id)).scalars().all()
+    refresh_book_documents(conn, book_ids)
+    db.commit()
+    return len(book_ids)
+
+
+def ensure_search_index(db: Session):
+    # Lần đầu tạo bảng book_search trên CSDL đã có sách thì phải dựng chỉ mục từ đầu
+    if db.execute(select(models.BookSearch.book_id).limit(1)).first() is None \
+            and db.execute(select(models.Book.id).limit(1)).first() is not None:
+        rebuild_search_index(db)
+
+
+# Thêm điều kiện tìm kiếm toàn văn vào câu SELECT sách, trả về (query, biểu thức xếp hạng)
+def apply_book_search(query, q: str, dialect: str):
+    tokens = tokenize(q)
+    if not tokens:
+        return query, None
+
+    if dialect == "sqlite":
+        fts_query = " ".join(f'"{token}"*' for token in tokens)
+        query = query.join(_fts, _fts.c.rowid == models.Book.id)\
+                     .where(text("book_search_fts MATCH :fts_query").bindparams(fts_query=fts_query))
+        # rank của FTS5 là bm25 âm: càng nhỏ càng liên quan
+        return query, _fts.c.rank.asc()
+
+    query = query.join(models.BookSearch, models.BookSearch.book_id == models.Book.id)
+    long_tokens = [token for token in tokens if len(token) >= MYSQL_MIN_TOKEN_SIZE]
+    for token in tokens:
+        if len(token) < MYSQL_MIN_TOKEN_SIZE:
+            query = query.where(models.BookSearch.document.like(f"%{token}%"))
+    if not long_tokens:
+        return query, None
+
+    relevance = match(models.BookSearch.document,
+                      against=" ".join(f"+{token}*" for token in long_tokens)).in_boolean_mode()
+    return query.where(relevance > 0), relevance.desc()
+
+
+INDEXED_BOOK_FIELDS = ("title", "description", "main_author_id")
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_search_index(session, flush_context):
+    # Giữ book_search đồng bộ với các thay đổi qua ORM; thao tác core (bulk) phải tự gọi refresh
+    changed_books, changed_authors, deleted_books = set(), set(), set()
+
+    for obj in session.new:
+        if isinstance(obj, models.Book):
+            changed_books.add(obj.id)
+        elif isinstance(obj, models.BookAuthor):
+            changed_books.add(obj.book_id)
+    for obj in session.dirty:
+        state = inspect(obj)
+        if isinstance(obj, models.Book):
+            if any(state.attrs[field].history.has_changes() for field in INDEXED_BOOK_FIELDS):
+                changed_books.add(obj.id)
+        elif isinstance(obj, models.Author) and state.attrs.name.history.has_changes():
+            changed_authors.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, models.Book):
+            deleted_books.add(obj.id)
+        elif isinstance(obj, models.BookAuthor):
+            changed_books.add(obj.book_id)
+        elif isinstance(obj, models.Author):
+            changed_authors.add(obj.id)
+
+    if not (changed_books or changed_authors or deleted_books):
+        return
+
+    conn = session.connection()
+    if changed_authors:
+        changed_books.update(conn.execute(
+            select(models.Book.id).where(models.Book.main_author_id.in_(changed_authors))
+            .union(select(models.BookAuthor.book_id).where(models.BookAuthor.author_id.in_(changed_authors)))
+        ).scalars())
+    remove_book_documents(conn, deleted_books)
+    refresh_book_documents(conn, changed_books - deleted_books)
+
+
+if __name__ == "__main__":
+    # python -m app.utils.search rebuild
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m app.utils.search rebuild")
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        print(f"Indexed {rebuild_search_index(db)} books")
+    finally:
+        db.close()
@@ -55,4 +55,22 @@ CREATE TABLE book_authors (
     PRIMARY KEY (book_id, author_id),
     FOREIGN KEY (book_id) REFERENCES books(id),
     FOREIGN KEY (author_id) REFERENCES authors(id)
+);
+
+-- Bảng Borrows (lượt mượn sách)
+CREATE TABLE borrows (
+    id INTEGER PRIMARY KEY AUTO_INCREMENT,
+    book_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    borrow_date DATETIME NOT NULL,
+    due_date DATETIME NOT NULL,
+    return_date DATETIME,
+    status ENUM('borrowing', 'returned', 'overdue') NOT NULL DEFAULT 'borrowing',
+    active BOOLEAN DEFAULT TRUE, -- TRUE khi đang mượn/quá hạn, NULL khi đã trả
+    FOREIGN KEY (book_id) REFERENCES books(id),
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    UNIQUE KEY uq_borrows_user_book_active (user_id, book_id, active),
+    KEY ix_borrows_user_status_borrow_date (user_id, status, borrow_date),
+    KEY ix_borrows_user_book_status (user_id, book_id, status),
+    KEY ix_borrows_status_due_date (status, due_date)
 );
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""initial schema
+
+Bảng như create_all đã tạo trước khi có migration. Database cũ đã có sẵn các bảng này thì
+chỉ cần đánh dấu: python -m app.manage stamp 0001, rồi python -m app.manage migrate.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 17:46:38
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('authors',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_authors_id', 'authors', ['id'], unique=False)
+    op.create_index('ix_authors_name', 'authors', ['name'], unique=False)
+
+    op.create_table('categories',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=True),
+    sa.Column('description', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_categories_id', 'categories', ['id'], unique=False)
+    op.create_index('ix_categories_name', 'categories', ['name'], unique=True)
+
+    op.create_table('roles',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_roles_id', 'roles', ['id'], unique=False)
+    op.create_index('ix_roles_name', 'roles', ['name'], unique=True)
+
+    op.create_table('books',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=100), nullable=True),
+    sa.Column('main_author_id', sa.Integer(), nullable=True),
+    sa.Column('description', sa.String(length=500), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.ForeignKeyConstraint(['main_author_id'], ['authors.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_books_id', 'books', ['id'], unique=False)
+    op.create_index('ix_books_title', 'books', ['title'], unique=False)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=50), nullable=True),
+    sa.Column('email', sa.String(length=100), nullable=True),
+    sa.Column('hashed_password', sa.String(length=100), nullable=True),
+    sa.Column('phone', sa.String(length=15), nullable=True),
+    sa.Column('dob', sa.DateTime(), nullable=True),
+    sa.Column('is_active', sa.Integer(), nullable=False),
+    sa.Column('role_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['role_id'], ['roles.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_phone', 'users', ['phone'], unique=True)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table('book_authors',
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['author_id'], ['authors.id'], ),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+    sa.PrimaryKeyConstraint('book_id', 'author_id')
+    )
+
+    op.create_table('borrows',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('borrow_date', sa.DateTime(), nullable=False),
+    sa.Column('due_date', sa.DateTime(), nullable=False),
+    sa.Column('return_date', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.Enum('borrowing', 'returned', 'overdue', name='borrowstatus'), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_borrows_id', 'borrows', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_borrows_id', table_name='borrows')
+    op.drop_table('borrows')
+    op.drop_table('book_authors')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_index('ix_users_phone', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_table('users')
+    op.drop_index('ix_books_title', table_name='books')
+    op.drop_index('ix_books_id', table_name='books')
+    op.drop_table('books')
+    op.drop_index('ix_roles_name', table_name='roles')
+    op.drop_index('ix_roles_id', table_name='roles')
+    op.drop_table('roles')
+    op.drop_index('ix_categories_name', table_name='categories')
+    op.drop_index('ix_categories_id', table_name='categories')
+    op.drop_table('categories')
+    op.drop_index('ix_authors_name', table_name='authors')
+    op.drop_index('ix_authors_id', table_name='authors')
+    op.drop_table('authors')
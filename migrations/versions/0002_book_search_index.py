@@ -0,0 +1,41 @@
+"""book search index
+
+Bảng book_search chứa tài liệu tìm kiếm đã bỏ dấu của mỗi sách: FULLTEXT index trên MySQL,
+bảng ảo FTS5 book_search_fts trên SQLite. Nội dung được dựng lại bởi python -m app.manage migrate
+(hoặc rebuild-search) khi bảng còn trống.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 17:52:10
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('book_search',
+    sa.Column('book_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('document', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('book_id')
+    )
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.create_index('ix_book_search_document', 'book_search', ['document'], unique=False, mysql_prefix='FULLTEXT')
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS book_search_fts USING fts5(document, prefix='2 3')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.drop_index('ix_book_search_document', table_name='book_search')
+    elif dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS book_search_fts")
+    op.drop_table('book_search')
@@ -0,0 +1,42 @@
+"""borrow constraints and indexes
+
+Cờ active (TRUE khi đang mượn/quá hạn, NULL khi đã trả) cùng unique (user_id, book_id, active) để mỗi user
+chỉ có một lượt mượn hiệu lực cho mỗi cuốn; các index cho truy vấn theo user và job quét quá hạn.
+Database có sẵn hai lượt mượn hiệu lực trùng (user, book) sẽ làm bước tạo unique constraint thất bại:
+cần xử lý các dòng trùng trước.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 17:53:41
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('borrows', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('active', sa.Boolean(), nullable=True))
+
+    op.execute("UPDATE borrows SET active = TRUE WHERE status IN ('borrowing', 'overdue')")
+
+    with op.batch_alter_table('borrows', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_borrows_user_book_active', ['user_id', 'book_id', 'active'])
+        batch_op.create_index('ix_borrows_user_status_borrow_date', ['user_id', 'status', 'borrow_date'], unique=False)
+        batch_op.create_index('ix_borrows_user_book_status', ['user_id', 'book_id', 'status'], unique=False)
+        batch_op.create_index('ix_borrows_status_due_date', ['status', 'due_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('borrows', schema=None) as batch_op:
+        batch_op.drop_index('ix_borrows_status_due_date')
+        batch_op.drop_index('ix_borrows_user_book_status')
+        batch_op.drop_index('ix_borrows_user_status_borrow_date')
+        batch_op.drop_constraint('uq_borrows_user_book_active', type_='unique')
+        batch_op.drop_column('active')